@@ -0,0 +1,309 @@
+'''
+BATCH SIMULATION
+
+Runs SimulationConfig (or DynamicSimulationConfig with --daily) for every avatar and plan in a JSON
+file and prints one row per (avatar, plan, horizon). Only the headless model is imported so the
+command starts quickly.
+
+    python batch.py people.json
+    python batch.py people.json --daily --horizons 30 365 3650
+
+Input format:
+
+    {
+        "avatars": [{"name": "Ann", "age": 30, "sex": "female", "height": 65, "weight": 150}],
+        "plans": [{
+            "name": "cut",
+            "days": {
+                "Mon": {
+                    "breakfast": [{"food": "Bagel", "kcal": 250, "category": "Carbs", "servings": 1}],
+                    "lunch": [...],
+                    "dinner": [...],
+                    "exercise": [{"type": "running", "duration": 30}]
+                },
+                ...
+            }
+        }]
+    }
+
+Days that are left out get no meals and no exercise.
+
+Cohort files with millions of avatars are streamed instead: --cohort reads a CSV with name, age,
+sex, height, weight and plan columns (plan names one of the plans in the JSON file, or is left
+empty for all of them), simulates it in chunks on a pool of worker processes and writes CSV as
+the chunks finish, so memory stays the same however long the file is. Rows with a missing or
+out of range metric, a sex other than male or female, or a plan that is unknown or uses an unknown
+exercise type are skipped and counted on stderr.
+
+    python batch.py plans.json --cohort people.csv --output results.csv --workers 8
+'''
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+from collections import deque
+
+from model import Avatar, FoodItem, Plate, ExerciseSession, WeekPlan
+from model import SimulationConfig, DynamicSimulationConfig, SimulationResult, exerciseRegistry
+
+weekDays = ['Mon', 'Tues', 'Wed', 'Thurs', 'Fri', 'Sat', 'Sun']
+mealTypes = ['breakfast', 'lunch', 'dinner']
+
+# Converting JSON into model objects
+
+def avatarFromDict(data):
+    for key in ['age', 'sex', 'height', 'weight']:
+        if data.get(key) is None:
+            raise ValueError(f"avatar {data.get('name', '')!r} is missing {key}")
+    avatar = Avatar(data.get('name', ''), data.get('age'), data.get('sex'),
+                    data.get('height'), data.get('weight'))
+    avatar.updateBmi()
+    return avatar
+
+def plateFromList(items):
+    plate = Plate()
+    for item in items:
+        foodItem = FoodItem(item['food'], item['kcal'], item.get('category'))
+        plate.addFoodItem(foodItem, item.get('servings', 1))
+    return plate
+
+def weekPlanFromDict(data, avatar):
+    weekPlan = WeekPlan()
+    for day, dayData in data.get('days', dict()).items():
+        for mealType in mealTypes:
+            if mealType in dayData:
+                weekPlan.setMealPlate(day, plateFromList(dayData[mealType]), mealType)
+        for session in dayData.get('exercise', []):
+            weekPlan.addExercise(day, ExerciseSession(session['type'], session['duration'], avatar))
+    return weekPlan
+
+def isNumber(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def validatePlan(planData, planIndex):
+    # raises ValueError naming the plan and day, so a bad plan is one clear error up front rather
+    # than a KeyError in the middle of a batch or in every pool worker
+    if not isinstance(planData, dict) or not isinstance(planData.get('days', dict()), dict):
+        raise ValueError(f'plan {planIndex} needs a "days" object')
+    planName = planData.get('name', planIndex)
+    for day, dayData in planData.get('days', dict()).items():
+        if day not in weekDays:
+            raise ValueError(f"plan {planName!r}: unknown day {day!r} (use {', '.join(weekDays)})")
+        if not isinstance(dayData, dict):
+            raise ValueError(f'plan {planName!r}, {day}: expected an object')
+        for mealType in mealTypes:
+            for item in dayData.get(mealType, []):
+                if not isinstance(item, dict) or 'food' not in item or not isNumber(item.get('kcal')):
+                    raise ValueError(f'plan {planName!r}, {day} {mealType}: every food needs "food" and a numeric "kcal"')
+                servings = item.get('servings', 1)
+                if not isinstance(servings, int) or isinstance(servings, bool) or servings < 1:
+                    raise ValueError(f"plan {planName!r}, {day} {mealType}: servings of {item['food']!r} must be a whole number")
+        for session in dayData.get('exercise', []):
+            if not isinstance(session, dict) or 'type' not in session or not isNumber(session.get('duration')):
+                raise ValueError(f'plan {planName!r}, {day} exercise: every session needs "type" and a numeric "duration"')
+
+def validatePlans(plans):
+    for planIndex, planData in enumerate(plans):
+        validatePlan(planData, planIndex)
+
+# Running simulations
+
+def runSimulation(avatarData, planData, horizon, daily = False):
+    # the simulation moves the avatar's weight, so every run gets fresh objects
+    avatar = avatarFromDict(avatarData)
+    weekPlan = weekPlanFromDict(planData, avatar)
+    if daily:
+        sim = DynamicSimulationConfig(horizon, weekPlan, avatar)
+    else:
+        sim = SimulationConfig(horizon, weekPlan, avatar)
+    return SimulationResult(sim, avatar)
+
+def runBatch(data, horizons, daily = False):
+    for avatarIndex, avatarData in enumerate(data.get('avatars', [])):
+        for planIndex, planData in enumerate(data.get('plans', [])):
+            for horizon in horizons:
+                result = runSimulation(avatarData, planData, horizon, daily)
+                yield (avatarData.get('name', avatarIndex), planData.get('name', planIndex), horizon,
+                       result.getWeightChange(), result.getBmiChange())
+
+# Streaming cohort files
+
+def readCohortRows(path):
+    if path == '-':
+        for row in csv.DictReader(sys.stdin):
+            yield row
+    else:
+        with open(path, newline = '') as f:
+            for row in csv.DictReader(f):
+                yield row
+
+def chunkRows(rows, chunkSize):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parseMetric(value):
+    if value is None or value.strip() == '':
+        return None
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError(f'{value!r} is not a finite number')
+    return int(number) if number.is_integer() else number
+
+def buildDriverPlans(plans):
+    # one WeekPlan per plan, built once per process around a driver avatar whose metrics are
+    # swapped in for every row; the plan caches burn per avatar before the weight factor, so the
+    # results are the same as building everything fresh for each row. A plan with an unknown
+    # exercise type maps to None; rows that name it are skipped and rows without a plan leave it out.
+    driverPlans = dict()
+    exerciseTypes = exerciseRegistry.getTypes()
+    for planIndex, planData in enumerate(plans):
+        planName = str(planData.get('name', planIndex))
+        if any(session['type'] not in exerciseTypes for dayData in planData.get('days', dict()).values()
+               for session in dayData.get('exercise', [])):
+            driverPlans[planName] = None
+            continue
+        driver = Avatar('', 0, None, 0, 0)
+        driverPlans[planName] = (weekPlanFromDict(planData, driver), driver)
+    return driverPlans
+
+def simulateRow(driverPlans, row, horizons, daily):
+    age, height, weight = parseMetric(row.get('age')), parseMetric(row.get('height')), parseMetric(row.get('weight'))
+    sex = (row.get('sex') or '').strip().lower() or None
+    if age is None or sex is None or height is None or weight is None:
+        raise ValueError(f"avatar {row.get('name', '')!r} is missing a metric")
+    if sex not in ('male', 'female'):
+        raise ValueError(f"avatar {row.get('name', '')!r} has unknown sex {sex!r}")
+    if age < 0 or height <= 0 or weight <= 0:
+        raise ValueError(f"avatar {row.get('name', '')!r} has an out of range metric")
+    planName = (row.get('plan') or '').strip()
+    if planName == '':
+        planNames = [planName for planName in driverPlans if driverPlans[planName] is not None]
+    elif planName not in driverPlans:
+        raise ValueError(f'unknown plan {planName!r}')
+    elif driverPlans[planName] is None:
+        raise ValueError(f'plan {planName!r} uses an unknown exercise type')
+    else:
+        planNames = [planName]
+    results = []
+    for planName in planNames:
+        weekPlan, driver = driverPlans[planName]
+        driver.name, driver.age, driver.sex, driver.height = row.get('name', ''), age, sex, height
+        for horizon in horizons:
+            driver.weight = weight
+            driver.updateBmi()
+            if daily:
+                sim = DynamicSimulationConfig(horizon, weekPlan, driver)
+            else:
+                sim = SimulationConfig(horizon, weekPlan, driver)
+            result = SimulationResult(sim, driver)
+            results.append((driver.name, planName, horizon, result.getWeightChange(), result.getBmiChange()))
+    return results
+
+workerState = None
+
+def initWorker(plans, horizons, daily):
+    global workerState
+    workerState = (buildDriverPlans(plans), horizons, daily)
+
+def simulateChunk(rows):
+    # returns (result rows, number of input rows skipped because they were invalid); a row that
+    # fails is only counted, so one bad row never stops the rest of the stream
+    driverPlans, horizons, daily = workerState
+    results, numOfSkipped = [], 0
+    for row in rows:
+        try:
+            results += simulateRow(driverPlans, row, horizons, daily)
+        except (ValueError, ArithmeticError):
+            numOfSkipped += 1
+    return results, numOfSkipped
+
+def runCohort(rows, plans, horizons, daily = False, workers = None, chunkSize = 5000):
+    # yields simulateChunk results in input order; at most two chunks per worker are in flight.
+    # Plans are checked here, before any worker starts, since an error in the pool initializer
+    # only surfaces as BrokenProcessPool.
+    validatePlans(plans)
+    chunks = chunkRows(rows, chunkSize)
+    if workers == 0:
+        initWorker(plans, horizons, daily)
+        for chunk in chunks:
+            yield simulateChunk(chunk)
+        return
+    # imported here so plain JSON batches do not pay for loading the process pool machinery
+    from concurrent.futures import ProcessPoolExecutor
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, initializer = initWorker, initargs = (plans, horizons, daily)) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(simulateChunk, chunk))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def writeCohortResults(out, chunkResults, unit):
+    writer = csv.writer(out)
+    writer.writerow(['avatar', 'plan', f'horizon ({unit})', 'weight change', 'BMI change'])
+    numOfRows, numOfSkipped = 0, 0
+    for results, skipped in chunkResults:
+        writer.writerows((avatarName, planName, horizon, f'{weightChange:.3f}', f'{bmiChange:.3f}')
+                         for avatarName, planName, horizon, weightChange, bmiChange in results)
+        numOfRows += len(results)
+        numOfSkipped += skipped
+    return numOfRows, numOfSkipped
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Simulate weight and BMI change for avatars and week plans.')
+    parser.add_argument('file', help = "JSON file with 'avatars' and 'plans' ('-' for stdin)")
+    parser.add_argument('--horizons', type = int, nargs = '+',
+                        help = 'months (3, 6 or 12), or days with --daily')
+    parser.add_argument('--daily', action = 'store_true',
+                        help = 'use the day-by-day model with weight feedback and BMR')
+    parser.add_argument('--cohort', help = "CSV of avatars to stream instead of the JSON 'avatars' ('-' for stdin)")
+    parser.add_argument('--output', help = 'CSV file for --cohort results (default stdout)')
+    parser.add_argument('--workers', type = int,
+                        help = 'worker processes for --cohort (default: one per core, 0: no pool)')
+    parser.add_argument('--chunk-size', type = int, default = 5000, help = 'avatars per --cohort chunk')
+    args = parser.parse_args(argv)
+    if args.horizons is None:
+        args.horizons = [91, 182, 364] if args.daily else [3, 6, 12]
+    elif not args.daily and any(horizon not in (3, 6, 12) for horizon in args.horizons):
+        parser.error('horizons must be 3, 6 or 12 months without --daily')
+    if args.file == '-':
+        data = json.load(sys.stdin)
+    else:
+        with open(args.file) as f:
+            data = json.load(f)
+    unit = 'days' if args.daily else 'months'
+    try:
+        validatePlans(data.get('plans', []))
+    except ValueError as error:
+        parser.exit(1, f'error: {error}\n')
+    if args.cohort is not None:
+        chunkResults = runCohort(readCohortRows(args.cohort), data.get('plans', []), args.horizons,
+                                 args.daily, args.workers, args.chunk_size)
+        if args.output is None:
+            numOfRows, numOfSkipped = writeCohortResults(sys.stdout, chunkResults, unit)
+        else:
+            with open(args.output, 'w', newline = '') as out:
+                numOfRows, numOfSkipped = writeCohortResults(out, chunkResults, unit)
+        if numOfSkipped > 0:
+            print(f'skipped {numOfSkipped} avatars with missing or invalid metrics or unknown plans', file = sys.stderr)
+        return
+    print(f'avatar\tplan\thorizon ({unit})\tweight change\tBMI change')
+    try:
+        for avatarName, planName, horizon, weightChange, bmiChange in runBatch(data, args.horizons, args.daily):
+            print(f'{avatarName}\t{planName}\t{horizon}\t{weightChange:.3f}\t{bmiChange:.3f}')
+    except ValueError as error:
+        parser.exit(1, f'error: {error}\n')
+
+if __name__ == '__main__':
+    main()
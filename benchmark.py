@@ -0,0 +1,298 @@
+'''
+BENCHMARKS
+
+Times the model layer at scale and every screen's redraw and event handlers, without opening a
+window: a stub cmu_graphics module that only counts draw calls is installed before final.py is
+imported. Results are written as JSON so two versions can be compared.
+
+    python benchmark.py
+    python benchmark.py --quick --output new.json --compare old.json
+
+Every result has the median and best time per operation in microseconds, and for the screen
+benchmarks the number of draw calls one operation makes.
+'''
+
+import argparse
+import json
+import platform
+import sys
+import time
+import types
+from collections import Counter
+from statistics import median
+
+from model import Avatar, FoodItem, Plate, ExerciseSession, DayPlan, WeekPlan
+from model import SimulationConfig, DynamicSimulationConfig, SimulationResult
+
+drawCounts = Counter()
+
+# Stub drawing backend
+
+def makeStubGraphics():
+    stub = types.ModuleType('cmu_graphics')
+    def makeDrawFunction(name):
+        def drawFunction(*args, **kwargs):
+            drawCounts[name] += 1
+        return drawFunction
+    for name in ['drawLabel', 'drawRect', 'drawImage', 'drawLine', 'drawCircle', 'drawOval',
+                 'drawPolygon', 'drawArc', 'drawStar', 'drawRegularPolygon']:
+        setattr(stub, name, makeDrawFunction(name))
+    class CMUImage:
+        def __init__(self, image):
+            self.image = image
+    stub.CMUImage = CMUImage
+    stub.setActiveScreen = lambda screen: None
+    stub.runAppWithScreens = lambda *args, **kwargs: None
+    stub.rgb = lambda red, green, blue: (red, green, blue)
+    return stub
+
+def loadFinal():
+    sys.modules['cmu_graphics'] = makeStubGraphics()
+    import final
+    final.storePath = ':memory:'
+    return final
+
+class App:
+    width = 1200
+    height = 700
+
+# Timing
+
+def measure(run, numOfOps, repeat = 5):
+    # run() does numOfOps operations; the draw calls are counted on the first run only
+    drawCounts.clear()
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - start) / numOfOps * 1e6)
+        if i == 0:
+            drawCalls = sum(drawCounts.values()) / numOfOps
+    return {'ops': numOfOps, 'medianUs': median(times), 'bestUs': min(times), 'drawCalls': drawCalls}
+
+def makeFoods(numOfFoods):
+    categories = ['Carbs', 'Protein', 'Veggies', 'Beverage']
+    return [FoodItem(f'Food {i}', 20 + (i * 37) % 400, categories[i % 4]) for i in range(numOfFoods)]
+
+def makeAvatar():
+    avatar = Avatar('Bench', 30, 'female', 65, 150)
+    avatar.updateBmi()
+    return avatar
+
+def makeWeekPlan(avatar, sessionsPerDay, foods):
+    weekPlan = WeekPlan()
+    for day in weekPlan.week:
+        for mealType in ['breakfast', 'lunch', 'dinner']:
+            plate = Plate()
+            for foodItem in foods[:4]:
+                plate.addFoodItem(foodItem, 2)
+            weekPlan.setMealPlate(day, plate, mealType)
+        for i in range(sessionsPerDay):
+            weekPlan.addExercise(day, ExerciseSession(['weightlifting', 'running', 'swimming'][i % 3], 30, avatar))
+    return weekPlan
+
+# Model benchmarks
+
+def benchAddFoodItem(scale):
+    foods = makeFoods(40)
+    numOfPlates = 10000 // scale
+    def run():
+        for i in range(numOfPlates):
+            plate = Plate()
+            for j in range(4):
+                plate.addFoodItem(foods[(i + j * 10) % 40], 1)
+    return run, numOfPlates * 4
+
+def benchDailyBurnt(scale):
+    avatar = makeAvatar()
+    dayPlan = DayPlan()
+    for i in range(1000):
+        dayPlan.addExercise(ExerciseSession('running', 30, avatar))
+    numOfCalls = 1000 // scale
+    def run():
+        for i in range(numOfCalls):
+            dayPlan.markDirty()
+            dayPlan.getDailyBurnt()
+    return run, numOfCalls
+
+def benchWeeklyTotals(scale, isCached):
+    avatar = makeAvatar()
+    weekPlan = makeWeekPlan(avatar, 1000, makeFoods(40))
+    numOfCalls = (10000 if isCached else 200) // scale
+    def run():
+        for i in range(numOfCalls):
+            if not isCached:
+                for day in weekPlan.week:
+                    weekPlan.getDayPlan(day).markDirty()
+            weekPlan.computeWeeklyTotals()
+    return run, numOfCalls
+
+def benchSimulationResult(scale, configClass, horizon):
+    weekPlan = makeWeekPlan(makeAvatar(), 3, makeFoods(40))
+    numOfRuns = 2000 // scale
+    def run():
+        for i in range(numOfRuns):
+            avatar = makeAvatar()
+            SimulationResult(configClass(horizon, weekPlan, avatar), avatar)
+    return run, numOfRuns
+
+def benchMealPlanner(scale):
+    from mealplanner import MealPlanner
+    foods = makeFoods(4000)
+    menu = dict()
+    for foodItem in foods:
+        menu.setdefault('Beverages' if foodItem.category == 'Beverage' else foodItem.category, []).append(foodItem)
+    planner = MealPlanner(menu, menu)
+    planner.planWeek(2000)
+    numOfWeeks = 50 // scale
+    def run():
+        for i in range(numOfWeeks):
+            planner.planWeek(1500 + i * 20)
+    return run, numOfWeeks
+
+def benchFoodSearch(scale):
+    from foodsearch import FoodSearchIndex
+    index = FoodSearchIndex(makeFoods(10000))
+    queries = ['food 1', 'food 99', 'fod 12', 'food 4321', 'f']
+    numOfRounds = 200 // scale
+    def run():
+        for i in range(numOfRounds):
+            for query in queries:
+                index.search(query, 10)
+    return run, numOfRounds * len(queries)
+
+modelBenchmarks = {
+    'Plate.addFoodItem (10k plates)': benchAddFoodItem,
+    'DayPlan.getDailyBurnt (1k sessions, uncached)': benchDailyBurnt,
+    'WeekPlan.computeWeeklyTotals (1k sessions/day, uncached)': lambda scale: benchWeeklyTotals(scale, False),
+    'WeekPlan.computeWeeklyTotals (1k sessions/day, cached)': lambda scale: benchWeeklyTotals(scale, True),
+    'SimulationResult (weekly, 12 months)': lambda scale: benchSimulationResult(scale, SimulationConfig, 12),
+    'SimulationResult (daily, 10 years)': lambda scale: benchSimulationResult(scale, DynamicSimulationConfig, 3650),
+    'MealPlanner.planWeek (4k foods)': benchMealPlanner,
+    'FoodSearchIndex.search (10k foods)': benchFoodSearch,
+}
+
+# Screen benchmarks
+
+def makeScreenApp(final):
+    # one avatar with a full week of meals and exercise, building a lunch plate
+    app = App()
+    final.onAppStart(app)
+    avatar = makeAvatar()
+    final.addArchivedAvatar(app, avatar, 2)
+    for day in app.days:
+        for exerciseType in app.exerciseTypes:
+            app.weekPlan.addExercise(day, ExerciseSession(exerciseType, 30, avatar))
+        app.isExerciseConfirmed[day] = True
+    final.autoPlanMeals(app)
+    app.selectedMealType = 'lunch'
+    app.tempPlates[('Mon', 'lunch')] = Plate()
+    app.tempServingNums[('Mon', 'lunch')] = 1
+    app.selectedCategory = 'Protein'
+    final.buildFoodCellGrid(app, app.selectedCategory)
+    app.foodItemSelected = app.foodCells[0].foodItem
+    app.isServingToggleButtonDrawn = True
+    app.selectedExerciseType = 'running'
+    return app
+
+def getScreenNames(final):
+    return [name[:-len('_redrawAll')] for name in dir(final) if name.endswith('_redrawAll')]
+
+def getMousePoints(step = 50):
+    return [(x, y) for x in range(0, 1200, step) for y in range(0, 700, step)]
+
+def benchRedraw(final, app, screen, scale):
+    redrawAll = getattr(final, f'{screen}_redrawAll')
+    numOfFrames = 300 // scale
+    def run():
+        for i in range(numOfFrames):
+            redrawAll(app)
+    return run, numOfFrames
+
+def benchMouseMove(final, app, screen, scale):
+    # each move does the screen's hover lookup and recoloring; cmu_graphics redraws after it,
+    # which the redrawAll benchmark times separately
+    onMouseMove = getattr(final, f'{screen}_onMouseMove')
+    points = getMousePoints()
+    numOfSweeps = 10 // scale or 1
+    def run():
+        for i in range(numOfSweeps):
+            for mouseX, mouseY in points:
+                onMouseMove(app, mouseX, mouseY)
+    return run, numOfSweeps * len(points)
+
+def benchStep(final, app, screen, scale):
+    onStep = getattr(final, f'{screen}_onStep')
+    numOfSteps = 3000 // scale
+    def run():
+        for i in range(numOfSteps):
+            onStep(app)
+    return run, numOfSteps
+
+def benchMousePress(final, app, screen, points, scale):
+    # only presses that leave the benchmark state usable (selecting days and foods)
+    onMousePress = getattr(final, f'{screen}_onMousePress')
+    numOfRounds = 300 // scale
+    def run():
+        for i in range(numOfRounds):
+            for mouseX, mouseY in points:
+                onMousePress(app, mouseX, mouseY)
+    return run, numOfRounds * len(points)
+
+def runScreenBenchmarks(final, scale, repeat):
+    results = dict()
+    app = makeScreenApp(final)
+    for screen in getScreenNames(final):
+        results[f'{screen}_redrawAll'] = measure(*benchRedraw(final, app, screen, scale), repeat)
+        if hasattr(final, f'{screen}_onMouseMove'):
+            results[f'{screen}_onMouseMove'] = measure(*benchMouseMove(final, app, screen, scale), repeat)
+        if hasattr(final, f'{screen}_onStep'):
+            results[f'{screen}_onStep'] = measure(*benchStep(final, app, screen, scale), repeat)
+    dayPoints = [(x + w/2, y + h/2) for x, y, w, h in app.dayCells]
+    results['weeklySchedule_onMousePress (days)'] = measure(
+        *benchMousePress(final, app, 'weeklySchedule', dayPoints, scale), repeat)
+    foodPoints = [(cell.x + cell.w/2, cell.y + cell.h/2) for cell in app.foodCells]
+    results['plateBuilder_onMousePress (foods)'] = measure(
+        *benchMousePress(final, app, 'plateBuilder', foodPoints, scale), repeat)
+    return results
+
+# Running and comparing
+
+def runBenchmarks(scale = 1, repeat = 5, includeScreens = True):
+    results = dict()
+    for name, bench in modelBenchmarks.items():
+        results[name] = measure(*bench(scale), repeat)
+    if includeScreens:
+        results.update(runScreenBenchmarks(loadFinal(), scale, repeat))
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'scale': scale, 'results': results}
+
+def printResults(report, baseline = None):
+    oldResults = baseline['results'] if baseline is not None else dict()
+    print(f"{'benchmark':60} {'median us':>12} {'draws':>7}" + (f" {'vs old':>8}" if baseline else ''))
+    for name, result in report['results'].items():
+        line = f"{name:60} {result['medianUs']:12.2f} {result['drawCalls']:7.1f}"
+        if name in oldResults:
+            line += f" {result['medianUs'] / oldResults[name]['medianUs']:7.2f}x"
+        print(line)
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the model layer and screen handlers headlessly.')
+    parser.add_argument('--output', help = 'write the results to this JSON file')
+    parser.add_argument('--compare', help = 'JSON file from an earlier run to compare against')
+    parser.add_argument('--quick', action = 'store_true', help = 'do a tenth of the work per benchmark')
+    parser.add_argument('--repeat', type = int, default = 5, help = 'timed runs per benchmark (default 5)')
+    parser.add_argument('--model-only', action = 'store_true', help = 'skip the screen benchmarks')
+    args = parser.parse_args(argv)
+    report = runBenchmarks(10 if args.quick else 1, args.repeat, not args.model_only)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    printResults(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent = 2)
+
+if __name__ == '__main__':
+    main()
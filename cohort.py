@@ -0,0 +1,320 @@
+'''
+COHORT SIMULATION
+
+Batch version of SimulationConfig + SimulationResult. Instead of simulating one Avatar against one
+WeekPlan (and mutating the avatar), this takes arrays of avatar metrics and per-day intake/burn for
+many plans and computes the weight and BMI change for every (avatar, plan, horizon) combination in
+one NumPy pass. Nothing is mutated.
+
+The numbers match the single-avatar path in model.py: same 13/26/52 week horizons, same /20000
+weight formula, same rounded weight factor in the burn formula and the same BMI adjustments as
+Avatar.updateBmi. simulateCohortDynamic is the batch version of DynamicSimulationConfig,
+simulateCohortMultiWeek projects a MultiWeekPlan, and sweepExercise runs every (exercise type,
+duration) what-if for one avatar the same way.
+
+simulateMonteCarlo adds noise to one SimulationConfig: thousands of trajectories where meals are
+skipped, portions misjudged and sessions missed at random, summarised as percentile bands of
+weight and BMI for every week. The bands model imperfect adherence, not uncertainty around the
+plan: by default 10% of meals and 20% of exercise days are skipped, so the median ends up on
+the lighter or heavier side of the plan followed exactly, whichever the skipped kcal favour.
+'''
+
+import numpy as np
+
+from model import DynamicSimulationConfig, MultiWeekPlan, getBurnFactor
+
+weeksPerHorizon = {3: 13, 6: 26, 12: 52}
+
+# Converting model objects into arrays
+
+def weekPlanToArrays(weekPlan):
+    # burnRate is baseRate * duration summed per day; the avatar's weight factor is applied later
+    intake = np.zeros(7)
+    burnRate = np.zeros(7)
+    for i, day in enumerate(weekPlan.week):
+        dayPlan = weekPlan.getDayPlan(day)
+        intake[i] = dayPlan.getDailyIntake()
+        burnRate[i] = dayPlan.getDailyBurnRate()
+    return intake, burnRate
+
+def weekPlansToArrays(weekPlans):
+    intake = np.zeros((len(weekPlans), 7))
+    burnRate = np.zeros((len(weekPlans), 7))
+    for i, weekPlan in enumerate(weekPlans):
+        intake[i], burnRate[i] = weekPlanToArrays(weekPlan)
+    return intake, burnRate
+
+def multiWeekPlanToArrays(multiWeekPlan):
+    # shape (W, 7), copied out of the plan's columns
+    intake, burnRate = multiWeekPlan.getDailyColumns()
+    return np.array(intake).reshape(-1, 7), np.array(burnRate).reshape(-1, 7)
+
+def avatarsToArrays(avatars):
+    metrics = {'age': [], 'sex': [], 'height': [], 'weight': [], 'bmi': []}
+    for avatar in avatars:
+        for key in metrics:
+            value = getattr(avatar, key)
+            if key == 'sex':
+                metrics[key].append(value or '')
+            else:
+                metrics[key].append(np.nan if value is None else value)
+    return {key: np.array(values, dtype = object if key == 'sex' else float)
+            for key, values in metrics.items()}
+
+# Vectorized formulas
+
+def computeBmi(age, sex, height, weight):
+    weightKg = weight / 2.205
+    heightM = height * 0.0254
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        rawBmi = weightKg / (heightM ** 2)
+    rawBmi = np.where(height == 0, np.nan, rawBmi)
+    sexFactor = np.where(sex == 'male', -0.5, np.where(sex == 'female', 0.5, 0))
+    ageFactor = np.where(age > 30, 0.03 * (age - 30), 0)
+    return rawBmi + sexFactor + ageFactor
+
+def computeBmr(age, sex, height, weight):
+    weightKg = weight / 2.205
+    heightCm = height * 2.54
+    sexOffset = np.where(sex == 'male', 5, np.where(sex == 'female', -161, -78))
+    return 10 * weightKg + 6.25 * heightCm - 5 * age + sexOffset
+
+def weightFactors(weight):
+    # ExerciseSession.caloriesBurnt rounds with Python's round(), which differs from np.round on
+    # ties, so the (per avatar, not per combination) factor is computed the same way here
+    return np.array([round((w * 0.453 / 50), 3) for w in weight.tolist()])
+
+class CohortResult:
+
+    def __init__(self, horizons, oldWeight, oldBmi, newWeight, newBmi):
+        self.horizons = horizons
+        self.oldWeight = oldWeight
+        self.oldBmi = oldBmi
+        self.newWeight = newWeight
+        self.newBmi = newBmi
+
+    def getWeightChange(self):
+        return self.newWeight - self.oldWeight[:, None, None]
+
+    def getBmiChange(self):
+        return self.newBmi - self.oldBmi[:, None, None]
+
+def simulateCohort(avatarArrays, intake, burnRate, horizons = (3, 6, 12)):
+    # avatarArrays: dict from avatarsToArrays, each of shape (A,)
+    # intake, burnRate: shape (P, 7), one row per week plan
+    # results: shape (A, P, len(horizons))
+    age = avatarArrays['age']
+    sex = avatarArrays['sex']
+    height = avatarArrays['height']
+    weight = avatarArrays['weight']
+    intake = np.atleast_2d(intake)
+    burnRate = np.atleast_2d(burnRate)
+    numOfWeeks = np.array([weeksPerHorizon[horizon] for horizon in horizons], dtype = float)
+    factors = weightFactors(weight)
+    # summed day by day in the same order as WeekPlan.computeWeeklyTotals
+    totalIntake = np.zeros(intake.shape[0])
+    totalBurn = np.zeros((len(weight), intake.shape[0]))
+    for d in range(7):
+        totalIntake = totalIntake + intake[:, d]
+        totalBurn = totalBurn + burnRate[None, :, d] * factors[:, None]
+    weeklyNet = totalIntake[None, :] - totalBurn
+    weightChange = numOfWeeks[None, None, :] * weeklyNet[:, :, None] / 20000
+    newWeight = weight[:, None, None] + weightChange
+    oldBmi = avatarArrays.get('bmi')
+    if oldBmi is None:
+        oldBmi = computeBmi(age, sex, height, weight)
+    newBmi = computeBmi(age[:, None, None], sex[:, None, None], height[:, None, None], newWeight)
+    return CohortResult(tuple(horizons), weight, oldBmi, newWeight, newBmi)
+
+def simulateCohortDynamic(avatarArrays, intake, burnRate, horizons = (91, 182, 364), kCalPerLb = 3500):
+    # Same closed form as DynamicSimulationConfig, horizons are in days
+    age = avatarArrays['age']
+    sex = avatarArrays['sex']
+    height = avatarArrays['height']
+    weight = avatarArrays['weight']
+    intake = np.atleast_2d(intake)
+    burnRate = np.atleast_2d(burnRate)
+    bmrSlope = 10 / 2.205
+    bmrBase = computeBmr(age, sex, height, 0)
+    # daily maps weight -> a * weight + b, a: (P, 7), b: (A, P, 7)
+    a = 1 - (burnRate * 0.453 / 50 + bmrSlope) / kCalPerLb
+    b = (intake[None, :, :] - bmrBase[:, None, None]) / kCalPerLb
+    # prefixA[:, k], prefixB[:, :, k] compose the first k days of the week
+    prefixA = np.ones((a.shape[0], 8))
+    prefixB = np.zeros((len(weight), a.shape[0], 8))
+    for d in range(7):
+        prefixA[:, d + 1] = a[:, d] * prefixA[:, d]
+        prefixB[:, :, d + 1] = a[None, :, d] * prefixB[:, :, d] + b[:, :, d]
+    weekA = prefixA[:, 7]
+    weekB = prefixB[:, :, 7]
+    numOfDays = np.asarray(horizons)
+    numOfWeeks, extraDays = np.divmod(numOfDays, 7)
+    powerA = weekA[:, None] ** numOfWeeks[None, :]
+    # weekA < 1 whenever BMR is positive, so the geometric series is well defined
+    newWeight = (powerA[None, :, :] * weight[:, None, None] +
+                 weekB[:, :, None] * ((1 - powerA) / (1 - weekA[:, None]))[None, :, :])
+    newWeight = (prefixA[None, :, extraDays] * newWeight + prefixB[:, :, extraDays])
+    oldBmi = avatarArrays.get('bmi')
+    if oldBmi is None:
+        oldBmi = computeBmi(age, sex, height, weight)
+    newBmi = computeBmi(age[:, None, None], sex[:, None, None], height[:, None, None], newWeight)
+    return CohortResult(tuple(horizons), weight, oldBmi, newWeight, newBmi)
+
+def simulateCohortMultiWeek(avatarArrays, multiWeekPlan, horizons = (3, 6, 12)):
+    # Same formula as SimulationConfig with a MultiWeekPlan. counts[h, w] is how often plan week w
+    # runs within horizon h, so every horizon is one matrix product over the plan's weeks.
+    # results: shape (A, 1, len(horizons))
+    age = avatarArrays['age']
+    sex = avatarArrays['sex']
+    height = avatarArrays['height']
+    weight = avatarArrays['weight']
+    intake, burnRate = multiWeekPlanToArrays(multiWeekPlan)
+    counts = np.array([multiWeekPlan.getWeekCounts(weeksPerHorizon[horizon]) for horizon in horizons], dtype = float)
+    totalIntake = counts @ intake.sum(axis = 1)
+    totalBurnRate = counts @ burnRate.sum(axis = 1)
+    weightChange = (totalIntake[None, :] - weightFactors(weight)[:, None] * totalBurnRate[None, :]) / 20000
+    newWeight = weight[:, None, None] + weightChange[:, None, :]
+    oldBmi = avatarArrays.get('bmi')
+    if oldBmi is None:
+        oldBmi = computeBmi(age, sex, height, weight)
+    newBmi = computeBmi(age[:, None, None], sex[:, None, None], height[:, None, None], newWeight)
+    return CohortResult(tuple(horizons), weight, oldBmi, newWeight, newBmi)
+
+# What-if sweeps
+
+class SweepResult:
+
+    def __init__(self, exerciseTypes, durations, horizons, cohortResult):
+        self.exerciseTypes = exerciseTypes
+        self.durations = durations
+        self.horizons = horizons
+        shape = (len(exerciseTypes), len(durations), len(horizons))
+        self.weightChange = cohortResult.getWeightChange()[0].reshape(shape)
+        self.bmiChange = cohortResult.getBmiChange()[0].reshape(shape)
+
+    def getWeightChange(self):
+        return self.weightChange
+
+    def getBmiChange(self):
+        return self.bmiChange
+
+def sweepExercise(avatar, weekPlan, rates, durations = tuple(range(5, 185, 5)), horizons = (3, 6, 12),
+                  daily = False):
+    # Outcome of adding one session of every (type, duration) to each day of weekPlan, for every
+    # horizon. Each combination becomes one plan row, so the whole grid is a single cohort call.
+    # rates: {exerciseType: rate} as in ExerciseRegistry.rates; results have shape (T, D, H)
+    exerciseTypes = list(rates)
+    intake, burnRate = weekPlanToArrays(weekPlan)
+    extraBurnRate = np.array([rates[exerciseType] for exerciseType in exerciseTypes])[:, None] * np.asarray(durations)[None, :]
+    numOfPlans = extraBurnRate.size
+    planIntake = np.broadcast_to(intake, (numOfPlans, 7))
+    planBurnRate = burnRate[None, :] + extraBurnRate.reshape(numOfPlans, 1)
+    avatarArrays = avatarsToArrays([avatar])
+    if daily:
+        result = simulateCohortDynamic(avatarArrays, planIntake, planBurnRate, horizons)
+    else:
+        result = simulateCohort(avatarArrays, planIntake, planBurnRate, horizons)
+    return SweepResult(exerciseTypes, tuple(durations), tuple(horizons), result)
+
+# Monte Carlo adherence
+
+class MonteCarloResult:
+
+    def __init__(self, percentiles, weightBands, bmiBands, mealAdherence, exerciseAdherence):
+        # bands have shape (len(percentiles), numOfWeeks + 1), column 0 being the start
+        self.percentiles = percentiles
+        self.weightBands = weightBands
+        self.bmiBands = bmiBands
+        self.mealAdherence = mealAdherence
+        self.exerciseAdherence = exerciseAdherence
+
+    def getPercentiles(self):
+        return self.percentiles
+
+    def getWeightBands(self):
+        return self.weightBands
+
+    def getBmiBands(self):
+        return self.bmiBands
+
+    def getNumOfWeeks(self):
+        return self.weightBands.shape[1] - 1
+
+    def getAdherence(self):
+        # (share of meals eaten, share of exercise days done) the trajectories assume
+        return self.mealAdherence, self.exerciseAdherence
+
+def planToMealArrays(plan):
+    # kcal of every meal, shape (W, 7, 3), and burn rate, shape (W, 7), one row per plan week
+    weeks = plan.weeks if isinstance(plan, MultiWeekPlan) else [plan]
+    mealKcal = np.zeros((len(weeks), 7, 3))
+    burnRate = np.zeros((len(weeks), 7))
+    for w, weekPlan in enumerate(weeks):
+        for d, day in enumerate(weekPlan.week):
+            dayPlan = weekPlan.getDayPlan(day)
+            for m, mealType in enumerate(['breakfast', 'lunch', 'dinner']):
+                plate = dayPlan.getPlate(mealType)
+                mealKcal[w, d, m] = plate.getTotalkCal() if plate is not None else 0
+            burnRate[w, d] = dayPlan.getDailyBurnRate()
+    return mealKcal, burnRate
+
+def simulateMonteCarlo(config, numOfTrajectories = 10000, percentiles = (5, 25, 50, 75, 95),
+                       mealAdherence = 0.9, portionSd = 0.15, exerciseAdherence = 0.8, seed = None,
+                       poolSize = 1 << 16):
+    # Every trajectory eats each planned meal with probability mealAdherence, at a portion spread
+    # uniformly around the planned one with relative standard deviation portionSd, and does each
+    # day's routine with probability exerciseAdherence. One uniform draw per meal decides both:
+    # below mealAdherence the meal is eaten, and rescaled it is again uniform and gives the
+    # portion. Skipped meals and sessions are not made up for, so with the default adherence the
+    # bands describe a plan followed imperfectly and sit below (for meals) or above (for
+    # exercise) the plan followed exactly; with full adherence and no portion noise every
+    # trajectory equals the plain simulation.
+    #
+    # A week of either model is an affine map weight -> A * weight + B (A is 1 for the weekly
+    # model). poolSize weeks are sampled for every plan week and composed into such maps once, and
+    # each trajectory then draws one of them per week, so a 10 year daily run costs one random
+    # index and one multiply-add per trajectory and week. With the default pool the sampling
+    # error of the pool is far below that of the trajectories.
+    if not 0 < mealAdherence <= 1 or not 0 <= portionSd * 3 ** 0.5 <= 1:
+        raise ValueError('mealAdherence has to be in (0, 1] and portions cannot go below 0')
+    rng = np.random.default_rng(seed)
+    plan = config.weekPlan
+    avatar = config.avatar
+    mealKcal, burnRate = planToMealArrays(plan)
+    isDaily = isinstance(config, DynamicSimulationConfig)
+    numOfWeeks = config.getNumOfWeeks()
+    spread = portionSd * 3 ** 0.5
+    if isDaily:
+        bmrSlope = 10 / 2.205
+        bmrBase = avatar.computeBmr(0)
+    else:
+        factor = getBurnFactor(config.getOldWeight())
+    def sampleWeeks(planWeek, numOfDays):
+        draws = rng.random((poolSize, numOfDays, 3))
+        portions = np.where(draws < mealAdherence, 1 + spread * (draws * (2 / mealAdherence) - 1), 0)
+        intake = np.einsum('pdm,dm->pd', portions, mealKcal[planWeek, :numOfDays])
+        sessionBurnRate = burnRate[planWeek, :numOfDays] * (rng.random((poolSize, numOfDays)) < exerciseAdherence)
+        if not isDaily:
+            return np.ones(poolSize), (intake.sum(axis = 1) - sessionBurnRate.sum(axis = 1) * factor) / 20000
+        # the same daily maps as DynamicSimulationConfig, composed over the week
+        weekA, weekB = np.ones(poolSize), np.zeros(poolSize)
+        for d in range(numOfDays):
+            a = 1 - (sessionBurnRate[:, d] * 0.453 / 50 + bmrSlope) / config.kCalPerLb
+            weekA, weekB = a * weekA, a * weekB + (intake[:, d] - bmrBase) / config.kCalPerLb
+        return weekA, weekB
+    pools = dict()
+    weight = np.full(numOfTrajectories, float(config.getOldWeight()))
+    weights = np.empty((numOfWeeks + 1, numOfTrajectories))
+    weights[0] = weight
+    for week in range(numOfWeeks):
+        planWeek = plan.getPlanWeekIndex(week) if isinstance(plan, MultiWeekPlan) else 0
+        numOfDays = min(7, config.timeHorizon - 7 * week) if isDaily else 7
+        if (planWeek, numOfDays) not in pools:
+            pools[(planWeek, numOfDays)] = sampleWeeks(planWeek, numOfDays)
+        weekA, weekB = pools[(planWeek, numOfDays)]
+        picks = rng.integers(poolSize, size = numOfTrajectories)
+        weight = weekA[picks] * weight + weekB[picks]
+        weights[week + 1] = weight
+    weightBands = np.percentile(weights, percentiles, axis = 1)
+    bmiBands = computeBmi(avatar.age, avatar.sex, avatar.height, weightBands)
+    return MonteCarloResult(tuple(percentiles), weightBands, bmiBands, mealAdherence, exerciseAdherence)
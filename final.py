@@ -14,7 +14,8 @@ body metrics only affects the currently selected avatar, and switching avatars i
 to show that avatar's own stored metrics and BMI. (** How to test: On the avatar screen, press "Add", enter 
 a name, and press "Enter". Use the "+/-" buttons to adjust metrics. These changes apply only to this avatar.
 Then press "Look in archive" to select another avatar and observe that its metrics and BMI are different
-and update independently. **)
+and update independently. **) The archive scrolls (arrow keys or the scrollbar) and typing a name
+jumps to the first avatar starting with it, so there is no limit on the number of avatars.
 
 3. Weekly Meal and Exercise Planning
 
@@ -39,320 +40,248 @@ exercise, confirm a routine, then press "Set routine for entire week?")
 Once the week is fully planned (every meal and exercise routine confirmed for all 7 days), all
 day boxes turn green and the "Confirm Week" button also turns green. Then, the app simulates
 how the avatar's weight and BMI will change over 3, 6, or 12 months (your choice on time frame) given the 
-same habits repeat. 
+same habits repeat. With NumPy installed, the result also shows how far the weight could drift
+when meals are skipped, portions misjudged or workouts missed, as percentile bands per week.
 
 Note: After the simulation finishes (results are shown), the user clicks anywhere on the simulation screen,
 and a short animation plays showing the avatar getting slimmer or heavier. LOL :)
 
 '''
 
+import os
+import sys
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+import PIL.Image
 from cmu_graphics import *
+from model import *
+from foodsearch import FoodSearchIndex, loadFoodMenus, mergeMenus
+from mealplanner import MealPlanner
+from storage import AvatarStore
+from simworker import SimulationWorker
 
 # Classes
 
-class Avatar:
+class Button:
     
-    def __init__(self, name, age = None, sex = None, height = None, weight = None):
-        self.name = name
-        self.age = age
-        self.sex = sex
-        self.height = height
-        self.weight = weight
-        self.bmi = None
+    def __init__(self, x, y, w, h, label, backgroundColor, borderColor, fontSize, align, actionId = None):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.label = label
+        self.backgroundColor = backgroundColor
+        self.borderColor = borderColor
+        self.fontSize = fontSize
+        self.align = align
+        self.actionId = actionId
         
-    def updateBmi(self):
-        if self.height is None or self.weight is None or self.height == 0:
-            self.bmi = None
-            return
-        weightKg = self.weight / 2.205
-        heightM = self.height * 0.0254
-        rawBmi = weightKg / (heightM ** 2)
-        sexFactor = 0
-        if self.sex == 'male':
-            sexFactor = -0.5
-        elif self.sex == 'female':
-            sexFactor = 0.5
-        ageFactor = 0
-        if self.age is not None and self.age > 30:
-            ageFactor = 0.03 * (self.age - 30)
-        self.bmi = rawBmi + sexFactor + ageFactor
+    def getBounds(self):
+        left, right, top, bottom = hoverOrClick(self.x, self.y, self.w, self.h)
+        return left, top, right, bottom
         
-    def displayAge(self):
-        if self.age != None:
-            return f'Age: {self.age} years old'
-        else:
-            return 'Age: ---'
-            
-    def getAvatarName(self):
-        return self.name
+    def isClicked(self, mouseX, mouseY):
+        left, right, top, bottom = hoverOrClick(self.x, self.y, self.w, self.h)
+        return left < mouseX < right and top < mouseY < bottom
         
-    def displaySex(self):
-        if self.sex != None:
-            return f'Sex: {self.sex}'
-        else:
-            return 'Sex: ---'
+    def doesHover(self, mouseX, mouseY):
+        left, right, top, bottom = hoverOrClick(self.x, self.y, self.w, self.h)
+        return left < mouseX < right and top < mouseY < bottom
         
-    def displayWeight(self):
-        if self.weight != None:
-            return f'Weight: {self.weight} lbs'
-        else:
-            return 'Weight: ---'
+    def draw(self, app, backgroundColor = None, label = None):
+        if backgroundColor is None:
+            backgroundColor = self.backgroundColor
+        if label is None:
+            label = self.label
+        drawRect(self.x, self.y, self.w, self.h, 
+                 fill = backgroundColor, border = self.borderColor, align = self.align)
+        drawLabel(label, self.x, self.y, size = self.fontSize, font = 'montserrat')
         
-    def displayHeight(self):
-        if self.height != None:
-            return f'Height: {self.height} inches'
-        else:
-            return 'Height: ---'
-            
-    def displayBmi(self):
-        if self.bmi == None:
-            return 'Adjust settings to calculate your BMI!'
-        else:
-            return f'BMI: {self.bmi}'
-     
-class FoodItem:
+class HitGrid:
     
-    def __init__(self, foodName, kcalPerServ, category):
-        self.foodName = foodName
-        self.kcalPerServ = kcalPerServ
-        self.category = category
-        
-    def __eq__(self, other):
-        if isinstance(other, FoodItem):
-            return self.foodName == other.foodName and self.category == other.category
-            
-    def __hash__(self):
-        return hash((self.foodName, self.category))
-        
-    def getkCalPerServ(self):
-        return self.kcalPerServ
-        
-class Plate:
+    # Uniform grid over the canvas. Each rectangle is stored in every cell it overlaps, so a point
+    # query only looks at the few items in one cell no matter how many items the screen has.
     
-    def __init__(self):
-        self.plate = dict()
-        self.totalkCal = 0
-        
-    def addFoodItem(self, foodItem, servingNum):
-        if foodItem not in self.plate:
-            self.plate[foodItem] = servingNum
-        else:
-            self.plate[foodItem] += servingNum
-        self.totalkCal += foodItem.kcalPerServ * servingNum
-            
-    def removeFoodItem(self, foodItem, servingNum):
-        if foodItem in self.plate:
-            if servingNum >= self.plate[foodItem]:
-                self.totalkCal -= foodItem.kcalPerServ * self.plate[foodItem]
-                self.plate.pop(foodItem)
-            else:
-                self.plate[foodItem] -= servingNum
-                self.totalkCal -= foodItem.kcalPerServ * servingNum
+    def __init__(self, cellSize = 50):
+        self.cellSize = cellSize
+        self.cells = dict()
+        self.count = 0
+        
+    def add(self, item, bounds):
+        left, top, right, bottom = bounds
+        entry = (self.count, item, bounds)
+        self.count += 1
+        for row in range(int(top // self.cellSize), int(bottom // self.cellSize) + 1):
+            for col in range(int(left // self.cellSize), int(right // self.cellSize) + 1):
+                self.cells.setdefault((row, col), []).append(entry)
                 
-        
-    def displayPlate(self):
-        return f'{len(self.plate)} items, {self.totalkCal} calories'
-        
-class ExerciseSession:
+    def query(self, x, y):
+        # items containing (x, y), in the order they were added
+        hits = []
+        for order, item, (left, top, right, bottom) in self.cells.get((int(y // self.cellSize), int(x // self.cellSize)), []):
+            if left < x < right and top < y < bottom:
+                hits.append((order, item))
+        return [item for order, item in sorted(hits, key = lambda hit: hit[0])]
+        
+def buildHitGrid(items):
+    grid = HitGrid()
+    for item in items:
+        grid.add(item, item.getBounds())
+    return grid
     
-    def __init__(self, typeOf, duration, avatar):
-        self.typeOf = typeOf
-        self.duration = duration
-        self.avatar = avatar
-        
-    def caloriesBurnt(self):
-        if self.typeOf == 'weightlifting': baseRate = 5
-        elif self.typeOf == 'running': baseRate = 7
-        elif self.typeOf == 'swimming': baseRate = 12
-        avatarWeight = self.avatar.weight * 0.453
-        return baseRate * self.duration * round((avatarWeight / 50), 3)
-        
-class DayPlan:
+class HoverManager:
     
-    def __init__(self):
-        self.dayPlan = {'breakfast': None, 'lunch': None, 'dinner': None, 'exercise sessions': []}
-        
-    def setPlate(self, plate, mealType):
-        self.dayPlan[mealType] = plate
-        
-    def getPlate(self, mealType):
-        return self.dayPlan[mealType]
-        
-    def addExercise(self, session):
-        self.dayPlan['exercise sessions'].append(session)
-        
-    def getExercise(self):
-        return self.dayPlan['exercise sessions']
-        
-    def setExerciseRoutine(self, exercises):
-        self.dayPlan['exercise sessions'] = exercises
-        
-    def getDailyIntake(self):
-        totalIntake = 0
-        for component in self.dayPlan:
-            if component != 'exercise sessions':
-                if self.dayPlan[component] != None:
-                    totalIntake += self.dayPlan[component].totalkCal
-        return totalIntake
-        
-    def getDailyBurnt(self):
-        totalBurn = 0
-        for session in self.dayPlan['exercise sessions']:
-            totalBurn += session.caloriesBurnt()
-        return totalBurn
-            
-    def computeDailyCalorieBalance(self):
-        return self.getDailyIntake() - self.getDailyBurnt()
-        
-    def isCompleteDay(self):
-        if (self.dayPlan['breakfast'] is not None and self.dayPlan['lunch'] is not None and
-            self.dayPlan['dinner'] is not None and len(self.dayPlan['exercise sessions']) > 0):
-                return True
-        else:
-            return False
-            
-        
-class WeekPlan:
+    # Hover colors for one screen, recolored from onMouseMove so the views only read them. A move
+    # is one grid lookup, and only the element being left and the element being entered are
+    # recolored. Elements come in named groups so a rebuilt grid of cells replaces just its own
+    # group.
+    #
+    # Moves are applied as they come rather than coalesced per frame: cmu_graphics calls
+    # redrawAll after every onMouseMove, and the MVC checker forbids changing state in redrawAll,
+    # so every move already is its own frame. Deferring the lookup to onStep would add a step, and
+    # the redraw that follows it, for each pending move. A repeat of the last point is skipped.
     
     def __init__(self):
-        self.week = {'Mon': DayPlan(), 'Tues': DayPlan(), 'Wed': DayPlan(), 'Thurs': DayPlan(), 
-                     'Fri': DayPlan(), 'Sat': DayPlan(), 'Sun': DayPlan()}
-                     
-    def setDayPlan(self, day, dayPlan):
-        self.week[day] = dayPlan
-        
-    def getDayPlan(self, day):
-        return self.week[day]
-                     
-    def setMealPlate(self, day, plate, mealType):
-        self.week[day].setPlate(plate, mealType)
-        
-    def getMealPlate(self, day, mealType):
-        return self.week[day].getPlate(mealType)
-        
-    def addExercise(self, day, session):
-        self.week[day].addExercise(session)
-        
-    def getExercises(self, day):
-        return self.week[day].getExercise()
-        
-    def setSameRoutineForWeek(self, app, exercises):
-        for day in self.week:
-            dayPlan = self.week[day]
-            dayPlan.setExerciseRoutine(exercises)
-            app.isExerciseConfirmed[day] = True
+        self.groups = dict()
+        self.colors = dict()
+        self.grid = None
+        self.hovered = None
+        self.point = None
+        
+    def setGroup(self, name, elements, hoverColor, normalColor):
+        # normalColor is a color, or a function giving each element's own color
+        self.leave()
+        self.groups[name] = [(element, hoverColor, normalColor(element) if callable(normalColor) else normalColor)
+                             for element in elements]
+        self.grid = None
+        # the pointer may now be over a new element without having moved
+        if self.point is not None:
+            self.move(*self.point)
+        
+    def buildGrid(self):
+        self.grid = HitGrid()
+        self.colors = dict()
+        for entries in self.groups.values():
+            for element, hoverColor, normalColor in entries:
+                self.grid.add(element, element.getBounds())
+                self.colors[element] = (hoverColor, normalColor)
+        
+    def move(self, x, y):
+        if (x, y) == self.point and self.grid is not None:
+            return
+        self.point = (x, y)
+        if self.grid is None:
+            self.buildGrid()
+        hits = self.grid.query(x, y)
+        element = hits[-1] if hits != [] else None
+        if element is self.hovered:
+            return
+        self.leave()
+        if element is not None:
+            element.backgroundColor = self.colors[element][0]
+            self.hovered = element
+        
+    def leave(self):
+        if self.hovered is not None:
+            self.hovered.backgroundColor = self.colors[self.hovered][1]
+            self.hovered = None
             
-    def setSamePlateForWeek(self, app, plate, mealType):
-        for day in self.week:
-            dayPlan = self.week[day]
-            dayPlan.setPlate(plate, mealType)
-            app.tempPlates = dict()
-        
-    def computeWeeklyTotals(self):
-        totalIntake, totalBurn = 0, 0
-        for day in self.week:
-            dayPlan = self.week[day]
-            if dayPlan != None:
-                totalIntake += dayPlan.getDailyIntake()
-                totalBurn += dayPlan.getDailyBurnt()
-        return totalIntake, totalBurn
-        
-    def isDayComplete(self, day):
-        if self.week[day].isCompleteDay(): return True
-        else: return False
-        
-    def allDaysComplete(self):
-        for day in self.week:
-            if not self.week[day].isCompleteDay():
-                return False
-        return True
-        
-class SimulationConfig:
-    
-    def __init__(self, timeHorizon, weekPlan, avatar):
-        self.timeHorizon = timeHorizon
-        self.weekPlan = weekPlan
-        self.avatar = avatar
-        self.oldWeight = self.avatar.weight
-        self.oldbmi = self.avatar.bmi
-        
-    def computeWeightChange(self):
-        totalIntake, totalBurn = self.weekPlan.computeWeeklyTotals()
-        weeklyNet = totalIntake - totalBurn
-        if self.timeHorizon == 3: numOfWeeks = 13
-        elif self.timeHorizon == 6: numOfWeeks = 26
-        elif self.timeHorizon == 12: numOfWeeks = 52
-        totalNetkCal = numOfWeeks * weeklyNet
-        weightChange = totalNetkCal / 20000
-        return weightChange
-        
-    def updateAvatarWeight(self):
-        self.avatar.weight += self.computeWeightChange()
-        
-    def getOldBmi(self):
-        return self.oldbmi
-        
-    def getOldWeight(self):
-        return self.oldWeight
-        
-class SimulationResult:
+class ImageCache:
     
-    def __init__(self, simulation, avatar):
-        self.simulation = simulation
-        self.avatar = avatar
-        self.simulation.updateAvatarWeight()
-        self.avatar.updateBmi()
-        
-    def getWeightChange(self):
-        return self.avatar.weight - self.simulation.getOldWeight()
+    # Bounded LRU cache of decoded images. load(key) is only called on a miss, and the least
+    # recently drawn image is dropped once there are more than capacity of them.
+    
+    def __init__(self, capacity, load):
+        self.capacity = capacity
+        self.load = load
+        self.images = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        
+    def get(self, key):
+        if key in self.images:
+            self.hits += 1
+            self.images.move_to_end(key)
+            return self.images[key]
+        self.misses += 1
+        image = self.load(key)
+        self.images[key] = image
+        if len(self.images) > self.capacity:
+            self.images.popitem(last = False)
+        return image
+        
+    def preload(self, keys):
+        for key in keys:
+            if key not in self.images:
+                self.get(key)
+                
+    def getStats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.images)}
         
-    def getBmiChange(self):
-        return self.avatar.bmi - self.simulation.getOldBmi()
+class DisplayList:
+    
+    # Recorded draw calls for content that only changes with its key. Built once, then replayed
+    # every frame instead of re-formatting labels and re-reading the model.
+    
+    def __init__(self, key):
+        self.key = key
+        self.calls = []
         
-    def showChangeInString(self):
-        bmiChange = self.getBmiChange()
-        weightChange = self.getWeightChange()
-        if bmiChange == 0: bmiSign = 'same'
-        elif bmiChange > 0: bmiSign = 'increased'
-        else: bmiSign = 'decreased'
-        if weightChange == 0: weightSign = 'same'
-        elif weightChange > 0: weightSign = 'increased'
-        else: weightSign = 'decreased'
-        return (f'Your weight {weightSign} by {self.getWeightChange()},' +
-                f'and your BMI {bmiSign} by {self.getBmiChange()}'
-                )
-               
-    def showNewWeight(self):
-        return f'Your new weight is {self.avatar.weight}'
+    def record(self, drawFunction, *args, **kwargs):
+        self.calls.append((drawFunction, args, kwargs))
         
-    def showNewBmi(self):
-        return f'Your new BMI is {self.avatar.bmi}'
+    def replay(self):
+        for drawFunction, args, kwargs in self.calls:
+            drawFunction(*args, **kwargs)
         
-class Button:
+class AvatarNameIndex:
     
-    def __init__(self, x, y, w, h, label, backgroundColor, borderColor, fontSize, align):
-        self.x = x
-        self.y = y
-        self.w = w
-        self.h = h
-        self.label = label
-        self.backgroundColor = backgroundColor
-        self.borderColor = borderColor
-        self.fontSize = fontSize
-        self.align = align
+    # Avatar indices sorted by lowercased name, so the first name starting with a prefix is one
+    # binary search away. Adding an avatar is one insert instead of a rebuild.
+    
+    def __init__(self, names = ()):
+        self.entries = sorted((name.lower(), index) for index, name in enumerate(names))
         
-    def isClicked(self, mouseX, mouseY):
-        left, right, top, bottom = hoverOrClick(self.x, self.y, self.w, self.h)
-        return left < mouseX < right and top < mouseY < bottom
+    def add(self, name, index):
+        insort(self.entries, (name.lower(), index))
         
-    def doesHover(self, mouseX, mouseY):
-        left, right, top, bottom = hoverOrClick(self.x, self.y, self.w, self.h)
-        return left < mouseX < right and top < mouseY < bottom
+    def find(self, prefix):
+        # index of the alphabetically first avatar whose name starts with prefix, or None
+        prefix = prefix.lower()
+        position = bisect_left(self.entries, (prefix,))
+        if position < len(self.entries) and self.entries[position][0].startswith(prefix):
+            return self.entries[position][1]
+        return None
         
-    def draw(self, app):
-        drawRect(self.x, self.y, self.w, self.h, 
-                 fill = self.backgroundColor, border = self.borderColor, align = self.align)
-        drawLabel(self.label, self.x, self.y, size = self.fontSize, font = 'montserrat')
+class AvatarArchive:
+    
+    # Every avatar, with its name and body image number, and the name index over them.
+    
+    def __init__(self):
+        self.avatars = []
+        self.names = []
+        self.imageNums = []
+        self.nameIndex = AvatarNameIndex()
+        
+    def add(self, avatar, imageNum):
+        index = len(self.avatars)
+        self.avatars.append(avatar)
+        self.names.append(avatar.name)
+        self.imageNums.append(imageNum)
+        self.nameIndex.add(avatar.name, index)
+        return index
+        
+    def load(self, avatarsAndImageNums):
+        # a whole saved archive at once; the name index is sorted once instead of per avatar
+        for avatar, imageNum in avatarsAndImageNums:
+            self.avatars.append(avatar)
+            self.names.append(avatar.name)
+            self.imageNums.append(imageNum)
+        self.nameIndex = AvatarNameIndex(self.names)
+        
+    def getNumOfAvatars(self):
+        return len(self.avatars)
         
 class AvatarCell:
     
@@ -362,12 +291,15 @@ class AvatarCell:
         self.w = w
         self.h = h
         self.index = index
-        self.hover = False
+        self.backgroundColor = None
         self.name = name
         
     def getName(self):
         return self.name
         
+    def getBounds(self):
+        return self.x, self.y, self.x + self.w, self.y + self.h
+        
 class FoodCell:
 
     def __init__(self, x, y, w, h, category, foodItem):
@@ -382,6 +314,9 @@ class FoodCell:
     def getFoodItem(self):
         return self.foodItem
         
+    def getBounds(self):
+        return self.x, self.y, self.x + self.w, self.y + self.h
+        
     def foodCellisClicked(self, mouseX, mouseY):
         return self.x < mouseX < self.x + self.w and self.y < mouseY < self.y + self.h
         
@@ -390,41 +325,198 @@ class FoodCell:
         
 # Helper Functions
         
+# the archive grid; only the rows in view have cells, the rest is arithmetic on the index
+archiveCols = 3
+archiveVisibleRows = 3
+archiveCellW, archiveCellH = 180, 140
+archiveStartX, archiveStartY = 300, 140
+archivePaddingX, archivePaddingY = 60, 35
+archiveTrackX, archiveTrackW = 1020, 16
+
+def getArchiveNumOfRows(app):
+    return -(-avatarArchive.getNumOfAvatars() // archiveCols)
+    
+def getArchiveMaxRow(app):
+    return max(0, getArchiveNumOfRows(app) - archiveVisibleRows)
+
 def buildAvatarArchiveGrid(app):
+    # cells for the visible rows only, so this costs the same for 9 avatars or 10k
     app.avatarCells = []
-    cellW, cellH = 180, 140
-    cols = 3
-    startX = 300
-    startY = 140
-    paddingX = 60
-    paddingY = 35
-    for i in range(len(app.avatars)):
-        name = app.namesList[i]
-        row = i // cols
-        col = i % cols
-        x = startX + col * (cellW + paddingX)
-        y = startY + row * (cellH + paddingY)
-        app.avatarCells.append(AvatarCell(x, y, cellW, cellH, i, name))
+    firstIndex = app.archiveScrollRow * archiveCols
+    lastIndex = min(avatarArchive.getNumOfAvatars(), firstIndex + archiveVisibleRows * archiveCols)
+    for i in range(firstIndex, lastIndex):
+        name = avatarArchive.names[i]
+        row = i // archiveCols - app.archiveScrollRow
+        col = i % archiveCols
+        x = archiveStartX + col * (archiveCellW + archivePaddingX)
+        y = archiveStartY + row * (archiveCellH + archivePaddingY)
+        app.avatarCells.append(AvatarCell(x, y, archiveCellW, archiveCellH, i, name))
+    app.hoverManagers['avatarArchive'].setGroup('cells', app.avatarCells, 'lightYellow', None)
+    
+def setArchiveScrollRow(app, row):
+    row = min(max(row, 0), getArchiveMaxRow(app))
+    if row != app.archiveScrollRow:
+        app.archiveScrollRow = row
+        buildAvatarArchiveGrid(app)
+        
+def scrollArchiveTo(app, index):
+    # the row holding the avatar becomes the top row, as far as the scroll range allows
+    setArchiveScrollRow(app, index // archiveCols)
+    
+def addArchivedAvatar(app, avatar, imageNum):
+    # incremental: the index gets one entry and the cells are only rebuilt if the new avatar
+    # lands in a visible row
+    index = avatarArchive.add(avatar, imageNum)
+    if index // archiveCols < app.archiveScrollRow + archiveVisibleRows:
+        buildAvatarArchiveGrid(app)
+    return index
+    
+def getArchiveThumb(app):
+    # (top, height) of the scrollbar thumb, None while everything fits
+    numOfRows = getArchiveNumOfRows(app)
+    if numOfRows <= archiveVisibleRows:
+        return None
+    trackH = archiveVisibleRows * (archiveCellH + archivePaddingY) - archivePaddingY
+    thumbH = max(30, trackH * archiveVisibleRows / numOfRows)
+    top = archiveStartY + (trackH - thumbH) * app.archiveScrollRow / getArchiveMaxRow(app)
+    return top, thumbH
+    
+def scrollArchiveToY(app, mouseY):
+    # dragging the thumb: its center follows the pointer
+    thumb = getArchiveThumb(app)
+    if thumb is None:
+        return
+    top, thumbH = thumb
+    trackH = archiveVisibleRows * (archiveCellH + archivePaddingY) - archivePaddingY
+    fraction = (mouseY - thumbH / 2 - archiveStartY) / (trackH - thumbH)
+    setArchiveScrollRow(app, int(fraction * getArchiveMaxRow(app) + 0.5))
+    
+def isOnArchiveTrack(mouseX, mouseY):
+    trackH = archiveVisibleRows * (archiveCellH + archivePaddingY) - archivePaddingY
+    return (archiveTrackX - 10 < mouseX < archiveTrackX + archiveTrackW + 10 and
+            archiveStartY < mouseY < archiveStartY + trackH)
+    
+def getMenuName(app):
+    if app.selectedMealType == 'dinner' or app.selectedMealType == 'lunch':
+        return 'main'
+    else:
+        return 'breakfast'
+        
+def getFoodList(app, category):
+    if getMenuName(app) == 'main':
+        return app.foodMenu[category]
+    else:
+        return app.breakfastMenu[category]
+        
+def buildFoodSearchIndexes(app):
+    # built once the menus are loaded, so the first keystroke in the plate builder does not
+    # pay for indexing a large catalog
+    foodSearchIndexes.clear()
+    for menuName, menu in [('main', app.foodMenu), ('breakfast', app.breakfastMenu)]:
+        for category, foodList in menu.items():
+            foodSearchIndexes[(menuName, category)] = FoodSearchIndex(foodList)
+    
+def getFoodSearchIndex(app, category):
+    return foodSearchIndexes[(getMenuName(app), category)]
         
 def buildFoodCellGrid(app, category):
+    # only the current page of the menu (or of the search results) gets FoodCells
+    app.foodCells = []
     cellW, cellH = 240, 105
     cols = 3
     startX = 180
     startY = 210
     paddingX, paddingY = 60, 35
-    if app.selectedMealType == 'dinner' or app.selectedMealType == 'lunch':
-        foodList = app.foodMenu[category]
+    firstIndex = app.foodPage * app.foodsPerPage
+    lastIndex = firstIndex + app.foodsPerPage
+    if app.foodQuery == '':
+        foodList = getFoodList(app, category)
     else:
-        foodList = app.breakfastMenu[category]
-    for i in range(len(foodList)):
+        foodList = getFoodSearchIndex(app, category).search(app.foodQuery, lastIndex + 1)
+    pageFoods = foodList[firstIndex:lastIndex]
+    app.hasNextFoodPage = len(foodList) > lastIndex
+    for i in range(len(pageFoods)):
         row = i // cols
         col = i % cols
         x = startX + col * (cellW + paddingX)
         y = startY + row * (cellH + paddingY)
-        foodItem = foodList[i]
+        foodItem = pageFoods[i]
         app.foodCells.append(FoodCell(x, y, cellW, cellH, category, foodItem))
+    app.foodCellGrid = buildHitGrid(app.foodCells)
+    app.hoverManagers['plateBuilder'].setGroup('foodCells', app.foodCells, 'yellow', 'lightGray')
         
         
+def getAssetPath(fileName):
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), fileName)
+
+storePath = getAssetPath('avatars.db')
+activeProfiler = None
+# the running SimulationWorker; its thread updates the worker at any time, so it is kept out of
+# the app state that cmu_graphics compares around redrawAll
+simWorker = None
+# render caches; redrawAll fills them, so they are kept out of the app state as well
+displayLists = dict()
+bodyImages = None
+foodSearchIndexes = dict()
+# the avatar archive and its store. cmu_graphics deep-hashes the app state before and after every
+# redrawAll, which for an archive of 10k avatars costs more than drawing a frame
+avatarArchive = None
+avatarStore = None
+        
+def loadBodyImage(imageNum):
+    return CMUImage(PIL.Image.open(getAssetPath(f'person{imageNum}.png')).convert('RGBA'))
+    
+def loadFoodFiles(app):
+    # foods.csv / foods.json next to this file add to the built-in menus
+    for fileName in ['foods.csv', 'foods.json']:
+        path = getAssetPath(fileName)
+        if os.path.exists(path):
+            extraFoodMenu, extraBreakfastMenu = loadFoodMenus(path)
+            mergeMenus(app.foodMenu, extraFoodMenu)
+            mergeMenus(app.breakfastMenu, extraBreakfastMenu)
+    
+def loadExerciseFiles(app):
+    # exercises.csv / exercises.json next to this file add exercise types or change their rates
+    for fileName in ['exercises.csv', 'exercises.json']:
+        path = getAssetPath(fileName)
+        if os.path.exists(path):
+            exerciseRegistry.loadRates(path)
+            
+def buildExerciseButtons(app):
+    # up to three types keep the original spacing, more types share the space above the duration
+    slotH = 105 if len(app.exerciseTypes) <= 3 else 290 / len(app.exerciseTypes)
+    app.exerciseButtons = []
+    for i, exerciseType in enumerate(app.exerciseTypes):
+        y = 157.5 + slotH * (i + 0.5)
+        app.exerciseButtons.append(Button(600, y, 600, min(70, slotH - 10), exerciseType,
+                                          'lightGray', 'black', 14, 'center'))
+    app.hoverManagers['exerciseRoutine'].setGroup('exerciseButtons', app.exerciseButtons, 'lightYellow', 'lightGray')
+    
+def buildHoverManagers(app):
+    # the fixed buttons of every screen; cell grids add their own group when they are built
+    managers = app.hoverManagers
+    managers['menu'].setGroup('buttons', app.menuButtons, 'yellow', 'lightBlue')
+    managers['instructions'].setGroup('buttons', app.instructionsButtons, 'yellow', 'wheat')
+    managers['avatar'].setGroup('buttons', [button for button in app.avatarButtons if button.actionId != 'next'],
+                                'yellow', lambda button: avatarButtonColors.get(button.actionId, 'lightGray'))
+    managers['avatarArchive'].setGroup('buttons', app.avatarArchiveButtons, 'yellow', 'wheat')
+    managers['weeklySchedule'].setGroup('buttons', [app.weeklyScheduleButtons[key] for key in
+                                        ['breakfast', 'lunch', 'dinner', 'exercise', 'confirm']], 'yellow', 'lightGray')
+    managers['category'].setGroup('buttons', app.categoryButtons, 'lightYellow', 'lightGray')
+    managers['plateBuilder'].setGroup('buttons', app.plateBuilderButtons, 'yellow', 'lightGray')
+    managers['plateBuilder'].setGroup('wheatButtons', [app.backPlateButton] + app.foodPageButtons, 'yellow', 'wheat')
+    managers['exerciseRoutine'].setGroup('toggleButtons', app.exerciseToggleButtons, 'yellow', 'lightGray')
+    managers['exerciseRoutine'].setGroup('addButton', [app.exerciseRoutineAddButton], 'orange', 'red')
+    managers['exerciseRoutine'].setGroup('backButton', [app.exerciseRoutineBackButton], 'yellow', 'wheat')
+    
+def drawCached(app, name, key, build):
+    displayList = displayLists.get(name)
+    if displayList is None or displayList.key != key:
+        displayList = DisplayList(key)
+        build(app, displayList)
+        displayLists[name] = displayList
+    displayList.replay()
+    
 def hoverOrClick(x, y, w, h):
     left = x - w/2
     right = left + w
@@ -442,20 +534,54 @@ def hasConfirmedPlateForWeek(app, mealType):
     else:
         return False
         
+def loadSavedAvatars(app):
+    avatarArchive.load(avatarStore.loadAvatarIndex())
+    buildAvatarArchiveGrid(app)
+    if avatarArchive.getNumOfAvatars() > 0:
+        selectAvatar(app, 0)
+
+def selectAvatar(app, index):
+    # every avatar has its own week plan, read from the store the first time it is selected
+    app.selectedAvatarIndex = index
+    if index not in app.weekPlans:
+        savedPlan = avatarStore.loadWeekPlan(avatarArchive.avatars[index])
+        app.weekPlans[index] = savedPlan if savedPlan is not None else WeekPlan()
+        app.planHistories[index] = PlanHistory(app.weekPlans[index])
+    app.weekPlan = app.weekPlans[index]
+    app.planHistory = app.planHistories[index]
+    app.tempPlates.clear()
+    app.tempServingNums.clear()
+    resetPlanFlags(app)
+
+def resetPlanFlags(app):
+    # the confirmed and set-for-week flags follow whatever plan is now showing
+    for day in app.days:
+        app.isExerciseConfirmed[day] = len(app.weekPlan.getExercises(day)) > 0
+    app.hasSetRoutineForWeekBeenPressed = False
+    app.hasConfirmPlateForWeekBeenPressedB = False
+    app.hasConfirmPlateForWeekBeenPressedL = False
+    app.hasConfirmPlateForWeekBeenPressedD = False
+
+def undoPlanEdit(app):
+    if app.planHistory.undo():
+        resetPlanFlags(app)
+
+def redoPlanEdit(app):
+    if app.planHistory.redo():
+        resetPlanFlags(app)
+
+def saveSelectedAvatar(app):
+    if avatarArchive.getNumOfAvatars() == 0:
+        return
+    avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+    avatarStore.saveAvatar(avatar, avatarArchive.imageNums[app.selectedAvatarIndex])
+    avatarStore.saveWeekPlan(avatar, app.weekPlan)
+    avatarStore.flush()
+
 def showExerciseInfo(app):
     if app.selectedExerciseType is not None:
-        if app.selectedExerciseType == 'weightlifting':
-            baseRate = 5
-            avatarWeight = app.avatars[app.selectedAvatarIndex].weight * 0.453
-            kCalsBurnt = baseRate * app.exerciseDuration * round((avatarWeight / 50), 3)
-        elif app.selectedExerciseType == 'running':
-            baseRate = 7
-            avatarWeight = app.avatars[app.selectedAvatarIndex].weight * 0.453
-            kCalsBurnt = baseRate * app.exerciseDuration * round((avatarWeight / 50), 3)
-        elif app.selectedExerciseType == 'swimming':
-            baseRate = 12
-            avatarWeight = app.avatars[app.selectedAvatarIndex].weight * 0.453
-            kCalsBurnt = baseRate * app.exerciseDuration * round((avatarWeight / 50), 3)
+        avatarWeight = avatarArchive.avatars[app.selectedAvatarIndex].weight
+        kCalsBurnt = exerciseRegistry.getBurn(app.selectedExerciseType, app.exerciseDuration, avatarWeight)
         drawLabel('kCals burnt depneding on duration:', 
                    1020, 50, size = 16, font = 'montserrat')
         drawLabel(f'{kCalsBurnt} kCals', 1020, 75, size = 16, font = 'montserrat')
@@ -464,69 +590,116 @@ def showExerciseInfo(app):
 
 # Screens
 
+def buildMenuLabels(app, displayList):
+    displayList.record(drawLabel, 'Build Your Healthy Life', 600, 175, size = 35, font = 'montserrat')
+
 def drawMenuScreen(app):
-    drawLabel('Build Your Healthy Life', 600, 175, size = 35, font = 'montserrat')
+    drawCached(app, 'menu', None, buildMenuLabels)
     for button in app.menuButtons:
         button.draw(app)
         
+def buildInstructionsLabels(app, displayList):
+    displayList.record(drawLabel, 'Read Carefully', 600, 170, size = 55, font = 'montserrat', fill = 'red', bold = True)
+    displayList.record(drawLabel, '1) Customize your avatar by inputting your body metrics (age, height, sex, weight).', 600, 300, size = 25, font = 'montserrat')
+    displayList.record(drawLabel, '2) Plan out your weekly habits - meal combos & exercise.', 600, 350, size = 25, font = 'montserrat')
+    displayList.record(drawLabel, '3) Simulate how your weight and BMI would change over time if', 600, 400, size = 25, font = 'montserrat')
+    displayList.record(drawLabel, 'you repeated this exact weekly meal plan and exercise routine for a given time frame!', 600, 430, size = 25, font = 'montserrat')
+        
 def drawInstructionsScreen(app):
-    drawLabel('Read Carefully', 600, 170, size = 55, font = 'montserrat', fill = 'red', bold = True)
-    drawLabel('1) Customize your avatar by inputting your body metrics (age, height, sex, weight).', 600, 300, size = 25, font = 'montserrat')
-    drawLabel('2) Plan out your weekly habits - meal combos & exercise.', 600, 350, size = 25, font = 'montserrat')
-    drawLabel('3) Simulate how your weight and BMI would change over time if', 600, 400, size = 25, font = 'montserrat')
-    drawLabel('you repeated this exact weekly meal plan and exercise routine for a given time frame!', 600, 430, size = 25, font = 'montserrat')
+    drawCached(app, 'instructions', None, buildInstructionsLabels)
     for button in app.instructionsButtons:
         button.draw(app)
+        
+def avatarStatsKey(app):
+    if avatarArchive.getNumOfAvatars() == 0:
+        return None
+    avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+    return (app.selectedAvatarIndex, avatar.name, avatar.age, avatar.height, avatar.sex, avatar.weight, avatar.bmi)
+    
+def buildAvatarStats(app, displayList):
+    if avatarArchive.getNumOfAvatars() == 0:
+        displayList.record(drawLabel, 'Age: ---', 165, 472.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, 'Height: ---', 165, 507.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, 'Sex: ---', 165, 542.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, 'Weight: ---', 165, 577.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, 'Your BMI:', 390, 52.5, size = 25, font = 'montserrat')
+        displayList.record(drawLabel, 'Adjust settings to calculate your BMI!', 390, 105, size = 23, fill = 'red', font = 'montserrat')
+    else:
+        avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+        displayList.record(drawLabel, avatar.displayAge(), 165, 472.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, avatar.displayHeight(), 165, 507.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, avatar.displaySex(), 165, 542.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, avatar.displayWeight(), 165, 577.5, size = 20, font = 'montserrat')
+        displayList.record(drawLabel, f'{avatar.displayBmi()}', 390, 105, size = 23, fill = 'red', font = 'montserrat')
+        displayList.record(drawLabel, 'Your BMI:', 390, 52.5, size = 25, font = 'montserrat')
+        displayList.record(drawLabel, f'Avatar Name: {avatar.getAvatarName()}', 
+                           390, 155, size = 20, fill = 'royalBlue', font = 'montserrat')
+    
+def buildAvatarLabels(app, displayList):
+    displayList.record(drawLabel, 'Pick Sex:', 975, 43.75, size = 20, font = 'montserrat')
+    displayList.record(drawLabel, 'Age Toggle:', 975, 210, size = 20, font = 'montserrat')
+    displayList.record(drawLabel, 'Height Toggle:', 975, 385, size = 20, font = 'montserrat')
+    displayList.record(drawLabel, 'Weight Toggle:', 975, 560, size = 20, font = 'montserrat')
+    displayList.record(drawLabel, '+1/-1', 970, 260, size = 16, font = 'montserrat')
+    displayList.record(drawLabel, '+10/-10', 970, 340, size = 16, font = 'montserrat')
+    displayList.record(drawLabel, '+1/-1', 970, 430, size = 16, font = 'montserrat')
+    displayList.record(drawLabel, '+5/-5', 970, 515, size = 16, font = 'montserrat')
+    displayList.record(drawLabel, '+1/-1', 970, 605, size = 16, font = 'montserrat')
+    displayList.record(drawLabel, '+10/-10', 970, 665, size = 16, font = 'montserrat')
+    displayList.record(drawLabel, '(must press before inputting body metrics)', 615, 525, font = 'montserrat', size = 10, fill = 'red')
     
 def drawAvatarScreen(app):
     for button in app.avatarButtons:
         button.draw(app)
-    if app.avatars == []:
-        drawLabel('Age: ---', 165, 472.5, size = 20, font = 'montserrat')
-        drawLabel('Height: ---', 165, 507.5, size = 20, font = 'montserrat')
-        drawLabel('Sex: ---', 165, 542.5, size = 20, font = 'montserrat')
-        drawLabel('Weight: ---', 165, 577.5, size = 20, font = 'montserrat')
-        drawLabel('Your BMI:', 390, 52.5, size = 25, font = 'montserrat')
-        drawLabel('Adjust settings to calculate your BMI!', 390, 105, size = 23, fill = 'red', font = 'montserrat')
-    else:
-        drawLabel(app.avatars[app.selectedAvatarIndex].displayAge(), 165, 472.5, size = 20, font = 'montserrat')
-        drawLabel(app.avatars[app.selectedAvatarIndex].displayHeight(), 165, 507.5, size = 20, font = 'montserrat')
-        drawLabel(app.avatars[app.selectedAvatarIndex].displaySex(), 165, 542.5, size = 20, font = 'montserrat')
-        drawLabel(app.avatars[app.selectedAvatarIndex].displayWeight(), 165, 577.5, size = 20, font = 'montserrat')
-        drawLabel(f'{app.avatars[app.selectedAvatarIndex].displayBmi()}', 390, 105, size = 23, fill = 'red', font = 'montserrat')
-        drawLabel('Your BMI:', 390, 52.5, size = 25, font = 'montserrat')
-        drawLabel(f'Avatar Name: {app.avatars[app.selectedAvatarIndex].getAvatarName()}', 
-                  390, 155, size = 20, fill = 'royalBlue', font = 'montserrat')
-        drawImage(app.imageUrls[app.selectedAvatarIndex][:-4] + f'{app.imageNums[app.selectedAvatarIndex]}' + '.png', 325, 200)
-    drawLabel('Pick Sex:', 975, 43.75, size = 20, font = 'montserrat')
-    drawLabel('Age Toggle:', 975, 210, size = 20, font = 'montserrat')
-    drawLabel('Height Toggle:', 975, 385, size = 20, font = 'montserrat')
-    drawLabel('Weight Toggle:', 975, 560, size = 20, font = 'montserrat')
-    drawLabel('+1/-1', 970, 260, size = 16, font = 'montserrat')
-    drawLabel('+10/-10', 970, 340, size = 16, font = 'montserrat')
-    drawLabel('+1/-1', 970, 430, size = 16, font = 'montserrat')
-    drawLabel('+5/-5', 970, 515, size = 16, font = 'montserrat')
-    drawLabel('+1/-1', 970, 605, size = 16, font = 'montserrat')
-    drawLabel('+10/-10', 970, 665, size = 16, font = 'montserrat')
-    drawLabel('(must press before inputting body metrics)', 615, 525, font = 'montserrat', size = 10, fill = 'red')
+    drawCached(app, 'avatarStats', avatarStatsKey(app), buildAvatarStats)
+    if avatarArchive.getNumOfAvatars() > 0:
+        imageNum = min(max(avatarArchive.imageNums[app.selectedAvatarIndex], 0), app.numOfBodyImages - 1)
+        drawImage(bodyImages.get(imageNum), 325, 200)
+    drawCached(app, 'avatar', None, buildAvatarLabels)
     
     
 def drawAvatarArchiveScreen(app):
     drawLabel('Choose your archived avatar!', 600, 61.25, size = 25, font = 'montserrat')
+    if app.archiveQuery == '':
+        drawLabel('Type a name to jump to it', 600, 100, size = 16, font = 'montserrat')
+    elif app.archiveFoundIndex is None:
+        drawLabel(f'No avatar starts with "{app.archiveQuery}"', 600, 100, size = 16, fill = 'red', font = 'montserrat')
+    else:
+        drawLabel(f'Find: {app.archiveQuery} (enter selects)', 600, 100, size = 16, font = 'montserrat')
     for cell in app.avatarCells:
-        if cell.hover: fillColor = 'lightYellow'
-        else: fillColor = None
+        fillColor = cell.backgroundColor
         if app.selectedAvatarIndex == cell.index: borderColor = 'red'
+        elif app.archiveFoundIndex == cell.index: borderColor = 'blue'
         else: borderColor = 'black'
         drawRect(cell.x, cell.y, cell.w, cell.h, fill=fillColor, border=borderColor)
         drawLabel(f'{cell.getName()}', cell.x + cell.w/2, cell.y + cell.h/2, size = 15, font = 'montserrat')
+    thumb = getArchiveThumb(app)
+    if thumb is not None:
+        top, thumbH = thumb
+        trackH = archiveVisibleRows * (archiveCellH + archivePaddingY) - archivePaddingY
+        drawRect(archiveTrackX, archiveStartY, archiveTrackW, trackH, fill = 'lightGray')
+        drawRect(archiveTrackX, top, archiveTrackW, thumbH, fill = 'gray')
+        firstIndex = app.archiveScrollRow * archiveCols
+        numOfAvatars = avatarArchive.getNumOfAvatars()
+        lastIndex = min(numOfAvatars, firstIndex + archiveVisibleRows * archiveCols)
+        drawLabel(f'{firstIndex + 1}-{lastIndex} of {numOfAvatars}', archiveTrackX + archiveTrackW / 2,
+                  archiveStartY + trackH + 15, size = 12, font = 'montserrat')
     for button in app.avatarArchiveButtons:
         button.draw(app)
     
+def getWeeklyScheduleLabel(app, component):
+    # the meal and exercise buttons are labelled by what the selected day already has
+    if component == 'exercise':
+        return 'View Confirmed Routine' if app.isExerciseConfirmed[app.selectedDay] else 'Add Routine'
+    elif app.weekPlan.getMealPlate(app.selectedDay, component) is not None:
+        return 'View Confirmed Plate'
+    return 'Add Plate'
+    
 def drawWeeklyScheduleScreen(app):
+    weekComplete = app.weekPlan.allDaysComplete()
     for i, day in enumerate(app.days):
         x, y, w, h = app.dayCells[i]
-        if app.weekPlan.allDaysComplete():
+        if weekComplete:
             fill = 'lightGreen'
         elif day == app.selectedDay:
             fill = 'red'
@@ -549,49 +722,19 @@ def drawWeeklyScheduleScreen(app):
     for idx, (label, component) in enumerate(sections):
         rowY = baseY + idx * rowGap
         drawLabel(label, 240, rowY, size = 20, align = 'center', font = 'montserrat')
-        if component == 'exercise':
-            data = app.weekPlan.getExercises(app.selectedDay)
-            btnLabel = 'Add Routine' if not app.isExerciseConfirmed[app.selectedDay] else 'View Confirmed Routine'
-            app.weeklyScheduleButtons[component].label = btnLabel
-            app.weeklyScheduleButtons[component].y = rowY
-            app.weeklyScheduleButtons[component].draw(app)
+        app.weeklyScheduleButtons[component].draw(app, label = getWeeklyScheduleLabel(app, component))
+        if component == 'exercise' or app.weekPlan.getMealPlate(app.selectedDay, component) is not None:
             continue
-        mainBtn = app.weeklyScheduleButtons[component]
-        confirmedPlate = app.weekPlan.getMealPlate(app.selectedDay, component)
-        if confirmedPlate is not None:
-            mainBtn.label = 'View Confirmed Plate'
-            mainBtn.y = rowY
-            mainBtn.draw(app)
-            continue
-        key = (app.selectedDay, component)
-        tempPlate = app.tempPlates.get(key, None)
-        if tempPlate is not None and len(tempPlate.plate) > 0:
-            mainBtn.label = 'Add Plate'
-            mainBtn.y = rowY
-            mainBtn.draw(app)
-            viewBtn = app.weeklyScheduleButtons[f'appViewPlate_{component}']
-            confirmBtn = app.weeklyScheduleButtons[f'appConfirmPlate_{component}']
-            viewBtn.label = 'View Plate'
-            confirmBtn.label = 'Confirm Plate'
-            viewBtn.y = rowY - 20
-            confirmBtn.y = rowY + 20
-            viewBtn.draw(app)
-            confirmBtn.draw(app)
-            continue
-        mainBtn.label = 'Add Plate'
-        mainBtn.y = rowY
-        mainBtn.draw(app)
-        viewBtn = app.weeklyScheduleButtons[f'appViewPlate_{component}']
-        confirmBtn = app.weeklyScheduleButtons[f'appConfirmPlate_{component}']
-        viewBtn.label = ''
-        confirmBtn.label = ''
-        continue
-    confirmBtn = app.weeklyScheduleButtons['confirm']
-    if app.weekPlan.allDaysComplete():
-        confirmBtn.backgroundColor = 'green'
-    else:
-        confirmBtn.backgroundColor = 'red'
-    confirmBtn.draw(app)
+        tempPlate = app.tempPlates.get((app.selectedDay, component), None)
+        if tempPlate is not None and not tempPlate.isEmpty():
+            app.weeklyScheduleButtons[f'appViewPlate_{component}'].draw(app)
+            app.weeklyScheduleButtons[f'appConfirmPlate_{component}'].draw(app)
+    app.weeklyScheduleButtons['confirm'].draw(app, backgroundColor = 'green' if weekComplete else 'red')
+    app.autoPlanButton.draw(app)
+    if app.planHistory.canUndo():
+        app.undoButton.draw(app)
+    if app.planHistory.canRedo():
+        app.redoButton.draw(app)
     app.showOrHideDailyInfoButton.draw(app)
     if app.showDailyInfo:
         drawLabel(f'{app.weekPlan.getDayPlan(app.selectedDay).getDailyIntake()} kCals consumed', 150, 600, size = 16)
@@ -602,10 +745,13 @@ def drawWeeklyScheduleScreen(app):
         
         
     
+def buildCategoryLabels(app, displayList):
+    displayList.record(drawLabel, 'Choose category', 620, 87.5, size = 35, font = 'montserrat', fill = 'red')
+    
 def drawCategoryScreen(app):
     for button in app.categoryButtons:
        button.draw(app)
-    drawLabel('Choose category', 620, 87.5, size = 35, font = 'montserrat', fill = 'red')
+    drawCached(app, 'category', None, buildCategoryLabels)
         
 def drawPlateBuilderScreen(app):
     drawLabel('Pick a Food Item', 630, 70, size = 35, font = 'montserrat', fill = 'red')
@@ -619,6 +765,14 @@ def drawPlateBuilderScreen(app):
             border = 'black'
         drawRect(cell.x, cell.y, cell.w, cell.h, fill = cell.backgroundColor, border = border)
         drawLabel(cell.foodItem.foodName, cell.x + cell.w/2, cell.y + cell.h/2, size = 14, font = 'montserrat')
+    if app.foodQuery == '':
+        drawLabel('Type to search', 1000, 175, size = 16, font = 'montserrat', fill = 'gray')
+    else:
+        drawLabel(f'Search: {app.foodQuery}', 1000, 175, size = 16, font = 'montserrat')
+    if app.foodPage > 0 or app.hasNextFoodPage:
+        drawLabel(f'Page {app.foodPage + 1}', 880, 650, size = 16, font = 'montserrat')
+        for button in app.foodPageButtons:
+            button.draw(app)
     if app.isServingToggleButtonDrawn:
         drawLabel('Serving Amount', 360, 131.25, size = 16, font = 'montserrat')
         key = (app.selectedDay, app.selectedMealType)
@@ -632,8 +786,9 @@ def drawExerciseRoutineScreen(app):
     drawLabel('Add Exercise Routine', 600, 87.5, size = 22, font = 'montserrat')
     for button in app.exerciseButtons:
         if app.selectedExerciseType == button.label:
-            button.backgroundColor = 'yellow'
-        button.draw(app)
+            button.draw(app, 'yellow')
+        else:
+            button.draw(app)
     if app.selectedExerciseType is not None:
         drawLabel(f'Duration: {app.exerciseDuration} min', 600, 472.5, size = 16, font = 'montserrat')
         for button in app.exerciseToggleButtons:
@@ -646,13 +801,19 @@ def drawExerciseRoutineScreen(app):
 # onAppStart(app)
     
 def onAppStart(app):
+    global bodyImages, avatarArchive, avatarStore
+    app.hoverManagers = {screen: HoverManager() for screen in ['menu', 'instructions', 'avatar', 'avatarArchive',
+                         'weeklySchedule', 'category', 'plateBuilder', 'exerciseRoutine']}
     app.menuButtons = [
         Button(600, 350, 300, 35, 'Play', 'lightBlue', 'black', 20, 'center'),
         Button(600, 420, 300, 87.5, 'Instructions', 'lightBlue', 'black', 20, 'center')
     ]
     app.instructionsButtons = [Button(600, 612.5, 300, 87.5, 'Back to Main', 'wheat', 'black', 20, 'center')]
-    app.avatars = []
+    avatarArchive = AvatarArchive()
     app.avatarCells = []
+    app.archiveScrollRow = 0
+    app.archiveQuery = ''
+    app.archiveFoundIndex = None
     app.selectedAvatarIndex = 0
     app.tempName = ''
     app.isTypingName = False
@@ -661,44 +822,34 @@ def onAppStart(app):
     app.canConfirmCharacter = False
     app.avatarButtons = [
         Button(360, 647.5, 660, 52.5, 'Next step: Plan your weekly schedule', 'salmon', 
-               'black', 20, 'center'),
-        Button(585, 481.25, 300, 35, 'Look in archive', 'wheat', 'black', 20, 'center'),
-        Button(585, 525, 300, 35, 'Add                                          ', 'wheat', 'black', 20, 'center'),
-        Button(585, 568.75, 300, 35, 'Confirm', 'wheat', 'black', 20, 'center'),
-        Button(900, 122.5, 90, 52.5, 'M', 'lightBlue', 'black', 20, 'center'),
-        Button(1050, 122.5, 90, 52.5, 'F', 'pink', 'black', 20, 'center'),
-        Button(900, 260, 40, 30, '+', 'lightGray', 'black', 25, 'center'),
-        Button(900, 340, 40, 30, '+', 'lightGray', 'black', 25, 'center'),
-        Button(900, 430, 40, 30, '+', 'lightGray', 'black', 25, 'center'),
-        Button(900, 515, 40, 30, '+', 'lightGray', 'black', 25, 'center'),
-        Button(900, 605, 40, 30, '+', 'lightGray', 'black', 25, 'center'),
-        Button(900, 665, 40, 30, '+', 'lightGray', 'black', 25, 'center'),
-        Button(1050, 260, 40, 30, '-', 'lightGray', 'black', 25, 'center'),
-        Button(1050, 340, 40, 30, '-', 'lightGray', 'black', 25, 'center'),
-        Button(1050, 430, 40, 30, '-', 'lightGray', 'black', 25, 'center'),
-        Button(1050, 515, 40, 30, '-', 'lightGray', 'black', 25, 'center'),
-        Button(1050, 605, 40, 30, '-', 'lightGray', 'black', 25, 'center'),
-        Button(1050, 665, 40, 30, '-', 'lightGray', 'black', 25, 'center'),
-    ]
-    app.imageUrls = [
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        'https://raw.githubusercontent.com/CalebOuyang/15112finalProj/master/person.png',
-        
+               'black', 20, 'center', 'next'),
+        Button(585, 481.25, 300, 35, 'Look in archive', 'wheat', 'black', 20, 'center', 'archive'),
+        Button(585, 525, 300, 35, 'Add                                          ', 'wheat', 'black', 20, 'center', 'add'),
+        Button(585, 568.75, 300, 35, 'Confirm', 'wheat', 'black', 20, 'center', 'confirm'),
+        Button(900, 122.5, 90, 52.5, 'M', 'lightBlue', 'black', 20, 'center', 'sexMale'),
+        Button(1050, 122.5, 90, 52.5, 'F', 'pink', 'black', 20, 'center', 'sexFemale'),
+        Button(900, 260, 40, 30, '+', 'lightGray', 'black', 25, 'center', 'agePlus1'),
+        Button(900, 340, 40, 30, '+', 'lightGray', 'black', 25, 'center', 'agePlus10'),
+        Button(900, 430, 40, 30, '+', 'lightGray', 'black', 25, 'center', 'heightPlus1'),
+        Button(900, 515, 40, 30, '+', 'lightGray', 'black', 25, 'center', 'heightPlus5'),
+        Button(900, 605, 40, 30, '+', 'lightGray', 'black', 25, 'center', 'weightPlus1'),
+        Button(900, 665, 40, 30, '+', 'lightGray', 'black', 25, 'center', 'weightPlus10'),
+        Button(1050, 260, 40, 30, '-', 'lightGray', 'black', 25, 'center', 'ageMinus1'),
+        Button(1050, 340, 40, 30, '-', 'lightGray', 'black', 25, 'center', 'ageMinus10'),
+        Button(1050, 430, 40, 30, '-', 'lightGray', 'black', 25, 'center', 'heightMinus1'),
+        Button(1050, 515, 40, 30, '-', 'lightGray', 'black', 25, 'center', 'heightMinus5'),
+        Button(1050, 605, 40, 30, '-', 'lightGray', 'black', 25, 'center', 'weightMinus1'),
+        Button(1050, 665, 40, 30, '-', 'lightGray', 'black', 25, 'center', 'weightMinus10'),
     ]
-    app.imageNums = dict()
+    app.avatarButtonGrid = buildHitGrid(app.avatarButtons)
+    app.numOfBodyImages = 5
+    bodyImages = ImageCache(app.numOfBodyImages, loadBodyImage)
+    bodyImages.preload(range(app.numOfBodyImages))
     app.showBodyImageChange = False
     app.avatarArchiveButtons = [
         Button(90, 630, 120, 52.5, 'Back', 'wheat', 'black', 12, 'center')
     ]
-    app.namesList = []
-    app.foodMenu = {
+    app.foodMenu = foodCatalog.internMenu({
         'Carbs': [
             FoodItem('Brown Rice with Olive Oil', 150, 'Carbs'), 
             FoodItem('Quinoa Pilaf', 180, 'Carbs'),
@@ -743,8 +894,8 @@ def onAppStart(app):
             FoodItem('Hot Green Tea', 20, 'Beverage'),
             FoodItem('Vanilla Shake', 250, 'Beverage'),
         ]
-    }
-    app.breakfastMenu = {
+    })
+    app.breakfastMenu = foodCatalog.internMenu({
         'Carbs': [
             FoodItem('Oatemeal with Honey', 150, 'Carbs'), 
             FoodItem('Whole Wheat Toast', 90, 'Carbs'),
@@ -789,8 +940,9 @@ def onAppStart(app):
             FoodItem('Vanilla Shake', 250, 'Beverage'),
             FoodItem('Matcha', 180, 'Beverage')
         ]
-    }
+    })
     app.weekPlan = WeekPlan()
+    app.planHistory = PlanHistory(app.weekPlan)
     app.selectedDay = 'Mon'
     app.days = ['Mon', 'Tues', 'Wed', 'Thurs', 'Fri', 'Sat', 'Sun']
     app.dayCellHeight = 55
@@ -799,17 +951,21 @@ def onAppStart(app):
         'breakfast': Button(750, 175, 300, 52.5, 'Add Plate', 'lightGray', 'black', 20, 'center'),
         'lunch': Button(750, 262.5, 300, 52.5, 'Add Plate', 'lightGray', 'black', 20, 'center'),
         'dinner': Button(750, 350, 300, 52.5, 'Add Plate', 'lightGray', 'black', 20, 'center'),
-        'exercise': Button(750, 437.5, 300, 52.5, 'Add Exercise', 'lightGray', 'black', 20, 'center'),
+        'exercise': Button(750, 437.5, 300, 52.5, 'Add Routine', 'lightGray', 'black', 20, 'center'),
         'confirm': Button(750, 577.5, 300, 61.25, 'Confirm Week', 'lightGray', 'black', 20, 'center'),
-        'appViewPlate_breakfast': Button(1050, 175, 180, 40, 'View Plate', 'wheat', 'black', 14, 'center'),
-        'appConfirmPlate_breakfast': Button(1050, 215, 180, 40, 'Confirm Plate', 'lightGreen', 'black', 14, 'center'),
-        'appViewPlate_lunch': Button(1050, 262.5, 180, 40, 'View Plate', 'wheat', 'black', 14, 'center'),
-        'appConfirmPlate_lunch': Button(1050, 302.5, 180, 40, 'Confirm Plate', 'lightGreen', 'black', 14, 'center'),
-        'appViewPlate_dinner': Button(1050, 350, 180, 40, 'View Plate', 'wheat', 'black', 14, 'center'),
-        'appConfirmPlate_dinner': Button(1050, 390, 180, 40, 'Confirm Plate', 'lightGreen', 'black', 14, 'center')
+        'appViewPlate_breakfast': Button(1050, 155, 180, 40, 'View Plate', 'wheat', 'black', 14, 'center'),
+        'appConfirmPlate_breakfast': Button(1050, 195, 180, 40, 'Confirm Plate', 'lightGreen', 'black', 14, 'center'),
+        'appViewPlate_lunch': Button(1050, 242.5, 180, 40, 'View Plate', 'wheat', 'black', 14, 'center'),
+        'appConfirmPlate_lunch': Button(1050, 282.5, 180, 40, 'Confirm Plate', 'lightGreen', 'black', 14, 'center'),
+        'appViewPlate_dinner': Button(1050, 330, 180, 40, 'View Plate', 'wheat', 'black', 14, 'center'),
+        'appConfirmPlate_dinner': Button(1050, 370, 180, 40, 'Confirm Plate', 'lightGreen', 'black', 14, 'center')
         }
     app.showDailyInfo = False
     app.showOrHideDailyInfoButton = Button(150, 550, 150, 50, 'Show Daily Info', 'lightGray', 'black', 16, 'center')
+    app.autoPlanButton = Button(150, 480, 150, 50, 'Auto-plan meals', 'wheat', 'black', 16, 'center')
+    app.undoButton = Button(110, 400, 70, 40, 'Undo', 'lightGray', 'black', 14, 'center')
+    app.redoButton = Button(190, 400, 70, 40, 'Redo', 'lightGray', 'black', 14, 'center')
+    app.mealPlanner = None
     app.dayHoverIndex = None
     app.dayCells = [
         (30, 35, 150, 70),
@@ -830,7 +986,18 @@ def onAppStart(app):
         Button(120, 70, 150, 52.5, 'Back', 'wheat', 'black', 15, 'center'),
         Button(120, 595, 180, 52.5, 'View Plate', 'wheat', 'black', 15, 'center')
     ]
+    loadFoodFiles(app)
+    buildFoodSearchIndexes(app)
+    app.foodQuery = ''
+    app.foodPage = 0
+    app.foodsPerPage = 9
+    app.hasNextFoodPage = False
+    app.foodPageButtons = [
+        Button(700, 650, 180, 45, 'Prev page', 'wheat', 'black', 14, 'center', 'prevPage'),
+        Button(1060, 650, 180, 45, 'Next page', 'wheat', 'black', 14, 'center', 'nextPage')
+    ]
     app.foodCells = []
+    app.foodCellGrid = HitGrid()
     app.foodItemSelected = None
     app.isServingToggleButtonDrawn = False
     app.plateBuilderButtons = [
@@ -849,12 +1016,9 @@ def onAppStart(app):
     app.tempPlates = dict()
     app.tempServingNums = dict()
     app.viewPlateReturnScreen = 'weeklySchedule'
-    app.exerciseTypes = ['weightlifting', 'running', 'swimming']
-    app.exerciseButtons = [
-        Button(600, 210, 600, 70, 'weightlifting', 'lightGray', 'black', 14, 'center'),
-        Button(600, 315, 600, 70, 'running', 'lightGray', 'black', 14, 'center'),
-        Button(600, 420, 600, 70, 'swimming', 'lightGray', 'black', 14, 'center')
-    ]
+    loadExerciseFiles(app)
+    app.exerciseTypes = exerciseRegistry.getTypes()
+    buildExerciseButtons(app)
     app.selectedExerciseType = None
     app.exerciseDuration = 30
     app.exerciseToggleButtons = [
@@ -879,58 +1043,249 @@ def onAppStart(app):
         Button(600, 350, 300, 70, '6 months', 'lightGray', 'black', 20, 'center'),
         Button(600, 450, 300, 70, '12 months', 'lightGray', 'black', 20, 'center')
     ]
+    app.simMode = 'weekly'
+    app.simModeButton = Button(600, 570, 300, 52.5, 'Model: Weekly average', 'wheat', 'black', 16, 'center')
+    app.simDaysPerHorizon = {3: 91, 6: 182, 12: 364}
+    app.sweepButton = Button(600, 640, 300, 45, 'What-if sweep', 'wheat', 'black', 16, 'center')
+    app.showSweep = False
+    app.sweep = None
+    app.sweepKey = 0
+    app.sweepMessage = ''
+    app.sweepMaxChange = 0
+    app.sweepDurations = list(range(5, 185, 5))
+    app.sweepHorizons = [3, 6, 12]
     app.simPhase = 0
     app.simSteps = 0
     app.simString = ''
     app.simDone = False
     app.simResult = None
-    app.stepsPerSecond = 30
+    app.simTrajectory = []
+    app.simBands = None
+    app.simBandsKey = 0
+    app.simCancelButton = Button(600, 450, 200, 52.5, 'Cancel', 'wheat', 'black', 16, 'center')
+    # steps only run at full rate while something animates, see scheduleSteps
+    app.activeStepsPerSecond = 30
+    app.idleStepsPerSecond = 1
+    app.stepsPerSecond = app.idleStepsPerSecond
+    displayLists.clear()
     app.steps = 0
+    avatarStore = AvatarStore(storePath)
+    app.weekPlans = dict()
+    app.planHistories = dict()
+    loadSavedAvatars(app)
+    buildHoverManagers(app)
+    
+def onAppStop(app):
+    if simWorker is not None:
+        simWorker.cancel()
+    saveSelectedAvatar(app)
+    avatarStore.close()
+    if activeProfiler is not None:
+        activeProfiler.printSummary()
+    
+# Step scheduling
+
+def needsSteps(app):
+    # the simulation progress and the body image change are the only things onStep animates
+    return app.simPhase == 1 or app.showBodyImageChange
+
+def scheduleSteps(app):
+    # called after anything that starts or ends an animation; when idle the app only redraws
+    # on input, plus one step a second
+    stepsPerSecond = app.activeStepsPerSecond if needsSteps(app) else app.idleStepsPerSecond
+    if app.stepsPerSecond != stepsPerSecond:
+        app.stepsPerSecond = stepsPerSecond
     
 # Simulation
 
 def simulation_onStep(app):
+    # the worker runs on its own thread; each step only reads how far it got
+    global simWorker
     if app.simPhase == 1:
-        app.simSteps += 1
-        if app.simSteps < 30:
-            app.simString = 'Taking in data...'
-        elif app.simSteps < 60:
-            app.simString = 'Calculating results...'
-        elif app.simSteps < 90:
-            app.simString = 'Finalizing...'
-        else:
-            app.simPhase = 2
-            app.simString = 'Completed!'
-            app.simDone = True
+        worker = simWorker
+        progress, message = worker.getProgress()
+        app.simString = f'{message} {int(progress * 100)}%'
+        if worker.isDone():
+            app.simResult = worker.applyResult()
+            app.simTrajectory = worker.getTrajectory()
+            app.simBands = worker.getBands()
+            app.simBandsKey += 1
+            simWorker = None
+            if app.simResult is None:
+                app.simPhase = 0
+                app.simString = message
+            else:
+                app.simPhase = 2
+                app.simString = 'Completed!'
+                app.simDone = True
+            scheduleSteps(app)
             
+def computeSweep(app):
+    # every exercise type and duration added to each day of the current plan, for all horizons
+    try:
+        from cohort import sweepExercise
+    except ImportError:
+        app.sweep = None
+        app.sweepMessage = 'The what-if sweep needs NumPy (pip install numpy)'
+        return
+    avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+    if app.simMode == 'daily':
+        horizons = [app.simDaysPerHorizon[months] for months in app.sweepHorizons]
+        app.sweep = sweepExercise(avatar, app.weekPlan, exerciseRegistry.rates, app.sweepDurations, horizons, True)
+    else:
+        app.sweep = sweepExercise(avatar, app.weekPlan, exerciseRegistry.rates, app.sweepDurations, app.sweepHorizons)
+    weightChange = app.sweep.getWeightChange()
+    app.sweepMaxChange = max(float(abs(weightChange).max()), 0.01)
+    app.sweepKey += 1
+    app.sweepMessage = ''
+    
+def getSweepColor(change, maxChange):
+    # green for weight lost, red for weight gained, stronger the further from 0
+    m = min(abs(change) / maxChange, 1)
+    if change < 0:
+        return rgb(int(255 - 200 * m), int(255 - 80 * m), int(255 - 200 * m))
+    return rgb(int(255 - 30 * m), int(255 - 200 * m), int(255 - 200 * m))
+    
+def buildSweepHeatmap(app, displayList):
+    sweep = app.sweep
+    weightChange = sweep.getWeightChange().tolist()
+    numOfTypes = len(sweep.exerciseTypes)
+    numOfHorizons = len(sweep.horizons)
+    left, top = 230, 170
+    cellW = 900 / len(sweep.durations)
+    rowH = min(22, (420 - numOfHorizons * 30) / (numOfHorizons * numOfTypes))
+    y = top
+    for h, months in enumerate(app.sweepHorizons):
+        displayList.record(drawLabel, f'{months} months', left, y + 8, size = 14, bold = True,
+                           align = 'left', font = 'montserrat')
+        y += 20
+        for t, exerciseType in enumerate(sweep.exerciseTypes):
+            displayList.record(drawLabel, exerciseType, left - 10, y + rowH/2, size = 12,
+                               align = 'right', font = 'montserrat')
+            for d in range(len(sweep.durations)):
+                change = weightChange[t][d][h]
+                displayList.record(drawRect, left + d * cellW, y, cellW, rowH,
+                                   fill = getSweepColor(change, app.sweepMaxChange))
+            y += rowH
+        y += 10
+    for d, duration in enumerate(sweep.durations):
+        if duration % 30 == 0:
+            displayList.record(drawLabel, f'{duration}', left + (d + 0.5) * cellW, y + 5, size = 12, font = 'montserrat')
+    displayList.record(drawLabel, 'minutes per day', left + 450, y + 22, size = 12, font = 'montserrat')
+    displayList.record(drawLabel, f'green: weight lost, red: weight gained (darkest = {app.sweepMaxChange:.1f} lbs)',
+                       600, y + 45, size = 14, font = 'montserrat')
+    
+def drawSweepScreen(app):
+    drawLabel('Weight change from adding one session to every day', 600, 140, size = 18, font = 'montserrat')
+    if app.sweep is None:
+        drawLabel(app.sweepMessage, 600, 300, size = 18, fill = 'red', font = 'montserrat')
+    else:
+        drawCached(app, 'sweep', app.sweepKey, buildSweepHeatmap)
+    
+def buildBandsChart(app, displayList):
+    # weight bands from the adherence sampling: 5-95th and 25-75th percentile shaded, the
+    # median and the plan as followed exactly drawn as lines
+    bands = app.simBands.getWeightBands().tolist()
+    numOfWeeks = app.simBands.getNumOfWeeks()
+    weights = [app.simResult.simulation.getOldWeight()] + list(app.simTrajectory)
+    low = min(bands[0] + weights)
+    high = max(bands[-1] + weights)
+    if high - low < 1:
+        low, high = low - 0.5, high + 0.5
+    left, top, width, height = 250, 240, 700, 230
+    def getPoint(week, weight):
+        return (left + week / numOfWeeks * width, top + (high - weight) / (high - low) * height)
+    displayList.record(drawRect, left, top, width, height, fill = None, border = 'gray')
+    for lower, upper, color in [(0, 4, 'lightBlue'), (1, 3, 'cornflowerBlue')]:
+        coords = []
+        for week in range(numOfWeeks + 1):
+            coords.extend(getPoint(week, bands[lower][week]))
+        for week in range(numOfWeeks, -1, -1):
+            coords.extend(getPoint(week, bands[upper][week]))
+        displayList.record(drawPolygon, *coords, fill = color, opacity = 70)
+    for line, color in [(bands[2], 'navy'), (weights, 'green')]:
+        for week in range(len(line) - 1):
+            displayList.record(drawLine, *getPoint(week, line[week]), *getPoint(week + 1, line[week + 1]),
+                               fill = color, lineWidth = 2)
+    displayList.record(drawLabel, f'{high:.1f} lbs', left - 10, top, size = 12, align = 'right', font = 'montserrat')
+    displayList.record(drawLabel, f'{low:.1f} lbs', left - 10, top + height, size = 12, align = 'right', font = 'montserrat')
+    displayList.record(drawLabel, 'week 0', left, top + height + 12, size = 12, font = 'montserrat')
+    displayList.record(drawLabel, f'week {numOfWeeks}', left + width, top + height + 12, size = 12, font = 'montserrat')
+    displayList.record(drawLabel, 'green: plan followed exactly, navy: median, shaded: 25-75th and 5-95th percentile',
+                       600, top + height + 35, size = 14, font = 'montserrat')
+    # the bands skip meals and sessions without making up for them, so they are not centred on
+    # the plan; the chart says so
+    mealAdherence, exerciseAdherence = app.simBands.getAdherence()
+    displayList.record(drawLabel, f'The bands assume {mealAdherence:.0%} of meals are eaten and {exerciseAdherence:.0%} '
+                       'of workout days are done, so they drift away from the plan', 600, top + height + 57,
+                       size = 14, font = 'montserrat')
+    bmiBands = app.simBands.getBmiBands()
+    displayList.record(drawLabel, f'Final BMI, 5th to 95th percentile: {bmiBands[0][-1]:.1f} to {bmiBands[-1][-1]:.1f}',
+                       600, top + height + 85, size = 16, font = 'montserrat')
+    
 def simulation_onMousePress(app, mouseX, mouseY):
-    if app.simPhase == 0:
+    global simWorker
+    if app.simPhase == 0 and app.sweepButton.isClicked(mouseX, mouseY):
+        app.showSweep = not app.showSweep
+        if app.showSweep:
+            computeSweep(app)
+            app.sweepButton.label = 'Hide what-if sweep'
+        else:
+            app.sweepButton.label = 'What-if sweep'
+        return
+    if app.simPhase == 0 and not app.showSweep:
         for button in app.simButtons:
             if button.isClicked(mouseX, mouseY):
                 if button.label == '3 months': horizon = 3
                 elif button.label == '6 months': horizon = 6
                 else: horizon = 12
-                sim = SimulationConfig(horizon, app.weekPlan, app.avatars[app.selectedAvatarIndex])
-                app.simResult = SimulationResult(sim, app.avatars[app.selectedAvatarIndex])
+                avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+                if app.simMode == 'daily':
+                    simWorker = SimulationWorker(DynamicSimulationConfig, app.simDaysPerHorizon[horizon],
+                                                 app.weekPlan, avatar)
+                else:
+                    simWorker = SimulationWorker(SimulationConfig, horizon, app.weekPlan, avatar)
+                simWorker.start()
                 app.simPhase = 1
                 app.simString = 'Starting...'
+        if app.simModeButton.isClicked(mouseX, mouseY):
+            if app.simMode == 'weekly':
+                app.simMode = 'daily'
+                app.simModeButton.label = 'Model: Day by day + BMR'
+            else:
+                app.simMode = 'weekly'
+                app.simModeButton.label = 'Model: Weekly average'
+    elif app.simPhase == 1 and app.simCancelButton.isClicked(mouseX, mouseY):
+        simWorker.cancel()
     if app.simPhase == 2:
+        saveSelectedAvatar(app)
         app.showBodyImageChange = True
         setActiveScreen('avatar')
+    scheduleSteps(app)
         
 def drawSimulationScreen(app):
     drawLabel('Weekly Simulation', 600, 100, size = 30)
-    if app.simPhase == 0:
+    if app.simPhase == 0 and app.showSweep:
+        drawSweepScreen(app)
+        app.sweepButton.draw(app)
+    elif app.simPhase == 0:
         for button in app.simButtons:
             button.draw(app)
+        app.simModeButton.draw(app)
+        app.sweepButton.draw(app)
     elif app.simPhase == 1:
         drawLabel(app.simString, 600, 350, size = 28)
+        app.simCancelButton.draw(app)
     elif app.simPhase == 2:
         result = app.simResult
-        drawLabel('Simulation Complete!', 600, 200, size = 30, fill = 'green')
-        drawLabel(f'Weight Change: {result.getWeightChange()} lbs', 600, 300, size = 22)
-        drawLabel(f'BMI Change: {result.getBmiChange()}', 600, 350, size = 22)
-        drawLabel('Want to run a simulation with another avatar? Click anywhere!', 600, 500, size = 18)
+        drawLabel('Simulation Complete!', 600, 160, size = 30, fill = 'green')
+        drawLabel(f'Weight Change: {result.getWeightChange()} lbs', 400, 205, size = 22)
+        drawLabel(f'BMI Change: {result.getBmiChange()}', 800, 205, size = 22)
+        if app.simBands is not None:
+            drawCached(app, 'simBands', app.simBandsKey, buildBandsChart)
+        else:
+            drawLabel('Uncertainty bands need NumPy (pip install numpy)', 600, 350, size = 18, font = 'montserrat')
+        drawLabel('Want to run a simulation with another avatar? Click anywhere!', 600, 620, size = 18)
         
 def simulation_redrawAll(app):
     drawSimulationScreen(app)
@@ -944,11 +1299,7 @@ def menu_onMousePress(app, mouseX, mouseY):
                 elif button.label == 'Instructions': setActiveScreen('instructions')
                 
 def menu_onMouseMove(app, mouseX, mouseY):
-    for button in app.menuButtons:
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'yellow'
-        else:
-            button.backgroundColor = 'lightBlue'
+    app.hoverManagers['menu'].move(mouseX, mouseY)
             
  
 def menu_redrawAll(app):
@@ -962,11 +1313,7 @@ def instructions_onMousePress(app, mouseX, mouseY):
                 if button.label == 'Back to Main': setActiveScreen('menu')
                 
 def instructions_onMouseMove(app, mouseX, mouseY):
-    for button in app.instructionsButtons:
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'yellow'
-        else:
-            button.backgroundColor = 'wheat'
+    app.hoverManagers['instructions'].move(mouseX, mouseY)
                 
 def instructions_redrawAll(app):
     drawInstructionsScreen(app)
@@ -974,21 +1321,22 @@ def instructions_redrawAll(app):
 
 # addName
 
+def buildAddNameLabels(app, displayList):
+    displayList.record(drawLabel, 'Please type the name for this avatar!', 600, 95, size = 30, font = 'montserrat')
+    displayList.record(drawLabel, "Press 'enter' on your keyboard when done!", 600, 145, size = 20, font = 'montserrat')
+
 def addName_redrawAll(app):
-    drawLabel('Please type the name for this avatar!', 600, 95, size = 30, font = 'montserrat')
-    drawLabel("Press 'enter' on your keyboard when done!", 600, 145, size = 20, font = 'montserrat')
+    drawCached(app, 'addName', None, buildAddNameLabels)
     drawLabel(app.tempName, 600, 200, size = 25, font = 'montserrat')
     
     
 
 def addName_onKeyPress(app, key):
     if key == 'enter':
-        app.avatars.append(Avatar(app.tempName))
-        app.namesList.append(app.tempName)
-        app.selectedAvatarIndex = len(app.avatars) - 1
+        saveSelectedAvatar(app)
+        index = addArchivedAvatar(app, Avatar(app.tempName), 2)
         app.tempName = ''
-        app.imageNums[len(app.avatars)-1] = 2
-        buildAvatarArchiveGrid(app)
+        selectAvatar(app, index)
         setActiveScreen('avatar')
     if key == 'space':
         app.tempName += ' '
@@ -1010,111 +1358,163 @@ def addName_onKeyRelease(app, key):
 
 # Avatar
     
+def changeAvatarMetric(attribute, delta):
+    def handler(avatar):
+        setattr(avatar, attribute, max(0, (getattr(avatar, attribute) or 0) + delta))
+    return handler
+    
+def setAvatarSex(sex):
+    def handler(avatar):
+        avatar.sex = sex
+    return handler
+    
+avatarMetricHandlers = {
+    'sexMale': setAvatarSex('male'),
+    'sexFemale': setAvatarSex('female'),
+    'agePlus1': changeAvatarMetric('age', 1),
+    'agePlus10': changeAvatarMetric('age', 10),
+    'heightPlus1': changeAvatarMetric('height', 1),
+    'heightPlus5': changeAvatarMetric('height', 5),
+    'weightPlus1': changeAvatarMetric('weight', 1),
+    'weightPlus10': changeAvatarMetric('weight', 10),
+    'ageMinus1': changeAvatarMetric('age', -1),
+    'ageMinus10': changeAvatarMetric('age', -10),
+    'heightMinus1': changeAvatarMetric('height', -1),
+    'heightMinus5': changeAvatarMetric('height', -5),
+    'weightMinus1': changeAvatarMetric('weight', -1),
+    'weightMinus10': changeAvatarMetric('weight', -10),
+}
+
+avatarButtonColors = {'next': 'salmon', 'archive': 'wheat', 'add': 'wheat', 'confirm': 'wheat',
+                      'sexMale': 'lightBlue', 'sexFemale': 'pink'}
+    
 def avatar_onMousePress(app, mouseX, mouseY):
-    for button in app.avatarButtons:
-            if button.isClicked(mouseX, mouseY):
-                if button.label == 'Add                                          ':
-                    app.canCustomizeCharacter = True
-                    if len(app.avatars) < 9:
-                        app.isTypingName = True
-                        setActiveScreen('addName')
-                        return
-                if app.canCustomizeCharacter:
-                    avatar = app.avatars[app.selectedAvatarIndex]
-                    if button.label == 'M': avatar.sex = 'male'
-                    elif button.label == 'F': avatar.sex = 'female'
-                    elif button.label == '+' and button.y == 260: avatar.age = (avatar.age or 0) + 1
-                    elif button.label == '+' and button.y == 340: avatar.age = (avatar.age or 0) + 10
-                    elif button.label == '+' and button.y == 430: avatar.height = (avatar.height or 0) + 1
-                    elif button.label == '+' and button.y == 515: avatar.height = (avatar.height or 0) + 5
-                    elif button.label == '+' and button.y == 605: avatar.weight = (avatar.weight or 0) + 1
-                    elif button.label == '+' and button.y == 665: avatar.weight = (avatar.weight or 0) + 10
-                    elif button.label == '-' and button.y == 260: avatar.age = max(0, (avatar.age or 0) - 1)
-                    elif button.label == '-' and button.y == 340: avatar.age = max(0, (avatar.age or 0) - 10)
-                    elif button.label == '-' and button.y == 430: avatar.height = max(0, (avatar.height or 0) - 1)
-                    elif button.label == '-' and button.y == 515: avatar.height = max(0, (avatar.height or 0) - 5)
-                    elif button.label == '-' and button.y == 605: avatar.weight = max(0, (avatar.weight or 0) - 1)
-                    elif button.label == '-' and button.y == 665: avatar.weight = max(0, (avatar.weight or 0) - 10)
-                    elif button.label == 'Confirm':
-                        if (avatar.age is not None and avatar.height is not None
-                            and avatar.weight is not None and avatar.sex is not None):
-                            app.canConfirmCharacter = True
-                            app.avatarButtons[0].backgroundColor = 'lightGreen'
-                    avatar.updateBmi()
-                if button.label == 'Look in archive':
-                    app.imageNums[app.selectedAvatarIndex] = 2
-                    setActiveScreen('avatarArchive')
-                if app.canConfirmCharacter and button.label == 'Next step: Plan your weekly schedule':
-                    setActiveScreen('weeklySchedule')
+    for button in app.avatarButtonGrid.query(mouseX, mouseY):
+        actionId = button.actionId
+        if actionId == 'add':
+            finishBodyImageChange(app)
+            app.canCustomizeCharacter = True
+            app.isTypingName = True
+            setActiveScreen('addName')
+            return
+        if app.canCustomizeCharacter:
+            avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+            if actionId in avatarMetricHandlers:
+                avatarMetricHandlers[actionId](avatar)
+            elif actionId == 'confirm':
+                if (avatar.age is not None and avatar.height is not None
+                    and avatar.weight is not None and avatar.sex is not None):
+                    app.canConfirmCharacter = True
+                    app.avatarButtons[0].backgroundColor = 'lightGreen'
+            avatar.updateBmi()
+        if actionId == 'archive':
+            finishBodyImageChange(app)
+            avatarArchive.imageNums[app.selectedAvatarIndex] = 2
+            if avatarArchive.getNumOfAvatars() > 0:
+                scrollArchiveTo(app, app.selectedAvatarIndex)
+            setActiveScreen('avatarArchive')
+        if app.canConfirmCharacter and actionId == 'next':
+            finishBodyImageChange(app)
+            saveSelectedAvatar(app)
+            setActiveScreen('weeklySchedule')
 
 def avatar_onMouseMove(app, mouseX, mouseY):
-    for button in app.avatarButtons:
-        if button.label == 'Next step: Plan your weekly schedule': continue
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'yellow'
-        else:
-            if (button.label == 'Look in archive' or 
-                button.label == 'Add' or button.label == 'Confirm'):
-                button.backgroundColor = 'wheat'
-            elif button.label == 'M': button.backgroundColor = 'lightBlue'
-            elif button.label == 'F': button.backgroundColor = 'pink'
-            else: button.backgroundColor = 'lightGray'
+    app.hoverManagers['avatar'].move(mouseX, mouseY)
             
-def avatar_onStep(app):
+def stepBodyImageChange(app):
     if app.showBodyImageChange:
         app.steps += 1
         if app.simResult.getWeightChange() > 0:
             if app.steps == 30:
-                app.imageNums[app.selectedAvatarIndex] += 1
+                avatarArchive.imageNums[app.selectedAvatarIndex] += 1
                 if app.simResult.getWeightChange() < 10:
                     app.steps = 0
                     app.showBodyImageChange = False
                     return
             elif app.steps == 60:
-                app.imageNums[app.selectedAvatarIndex] += 1
+                avatarArchive.imageNums[app.selectedAvatarIndex] += 1
                 app.steps = 0
                 app.showBodyImageChange = False
         elif app.simResult.getWeightChange() < 0:
             if app.steps == 30:
-                app.imageNums[app.selectedAvatarIndex] -= 1
+                avatarArchive.imageNums[app.selectedAvatarIndex] -= 1
                 if app.simResult.getWeightChange() > -5:
                     app.steps = 0
                     app.showBodyImageChange = False
                     return
             elif app.steps == 60:
-                app.imageNums[app.selectedAvatarIndex] -= 1
+                avatarArchive.imageNums[app.selectedAvatarIndex] -= 1
                 app.steps = 0
                 app.showBodyImageChange = False
+        else:
+            # nothing to animate, and without this the steps would keep running
+            app.showBodyImageChange = False
+                
+def finishBodyImageChange(app):
+    # the change only animates on the avatar screen (avatar_onStep), so leaving the screen
+    # skips to its end rather than keeping the steps at full rate on a screen that ignores them
+    while app.showBodyImageChange:
+        stepBodyImageChange(app)
+    scheduleSteps(app)
+                
+def avatar_onStep(app):
+    stepBodyImageChange(app)
+    scheduleSteps(app)
                 
 def avatar_redrawAll(app):
     drawAvatarScreen(app)
     
 # Avatar Archive
     
+def chooseArchivedAvatar(app, index):
+    saveSelectedAvatar(app)
+    selectAvatar(app, index)
+    app.canConfirmCharacter = False
+    app.avatarButtons[0].backgroundColor = 'salmon'
+    
 def avatarArchive_onMousePress(app, mouseX, mouseY):
     for cell in app.avatarCells:
         if cell.x < mouseX < cell.x + cell.w and cell.y < mouseY < cell.y + cell.h:
-            app.selectedAvatarIndex = cell.index
-            app.canConfirmCharacter = False
-            app.avatarButtons[0].backgroundColor = 'salmon'
+            chooseArchivedAvatar(app, cell.index)
+    if isOnArchiveTrack(mouseX, mouseY):
+        scrollArchiveToY(app, mouseY)
     for button in app.avatarArchiveButtons:
         if button.isClicked(mouseX, mouseY):
             setActiveScreen('avatar')
+            
+def avatarArchive_onMouseDrag(app, mouseX, mouseY):
+    if isOnArchiveTrack(mouseX, mouseY):
+        scrollArchiveToY(app, mouseY)
+        
+def avatarArchive_onKeyPress(app, key):
+    # arrows scroll a row, typing jumps to the first name starting with what was typed
+    if key == 'up':
+        setArchiveScrollRow(app, app.archiveScrollRow - 1)
+    elif key == 'down':
+        setArchiveScrollRow(app, app.archiveScrollRow + 1)
+    elif key == 'enter':
+        if app.archiveFoundIndex is not None:
+            chooseArchivedAvatar(app, app.archiveFoundIndex)
+    elif key in ['escape', 'backspace', 'space'] or len(key) == 1:
+        if key == 'escape': app.archiveQuery = ''
+        elif key == 'backspace': app.archiveQuery = app.archiveQuery[:-1]
+        elif key == 'space': app.archiveQuery += ' '
+        else: app.archiveQuery += key
+        jumpToArchiveQuery(app)
+        
+def jumpToArchiveQuery(app):
+    if app.archiveQuery == '':
+        app.archiveFoundIndex = None
+    else:
+        app.archiveFoundIndex = avatarArchive.nameIndex.find(app.archiveQuery)
+    if app.archiveFoundIndex is not None:
+        scrollArchiveTo(app, app.archiveFoundIndex)
                 
 def avatarArchive_redrawAll(app):
     drawAvatarArchiveScreen(app)
     
 def avatarArchive_onMouseMove(app, mouseX, mouseY):
-    for cell in app.avatarCells:
-        if cell.x < mouseX < cell.x + cell.w and cell.y < mouseY < cell.y + cell.h:
-            cell.hover = True
-        else:
-            cell.hover = False
-    for button in app.avatarArchiveButtons:
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'yellow'
-        else:
-            button.backgroundColor = 'wheat'
+    app.hoverManagers['avatarArchive'].move(mouseX, mouseY)
             
 # Weekly Schedule
 
@@ -1126,16 +1526,13 @@ def weeklySchedule_onMousePress(app, mouseX, mouseY):
         button = app.weeklyScheduleButtons[component]
         if button.isClicked(mouseX, mouseY):
             if component == 'exercise':
-                sessions = app.weekPlan.getExercises(app.selectedDay)
-                if button.label == 'View Confirmed Routine':
+                if getWeeklyScheduleLabel(app, component) == 'View Confirmed Routine':
                     setActiveScreen('viewRoutine')
                 else:
                     setActiveScreen('exerciseRoutine')
             elif component in ['breakfast', 'lunch', 'dinner']:
-                viewBtn = app.weeklyScheduleButtons[f'appViewPlate_{component}']
-                confirmBtn = app.weeklyScheduleButtons[f'appConfirmPlate_{component}']
                 confirmedPlate = app.weekPlan.getMealPlate(app.selectedDay, component)
-                if app.weeklyScheduleButtons[component].label == 'View Confirmed Plate':
+                if confirmedPlate is not None:
                     app.selectedMealType = component
                     app.viewPlateReturnScreen = 'weeklySchedule'
                     setActiveScreen('viewPlate')
@@ -1154,7 +1551,7 @@ def weeklySchedule_onMousePress(app, mouseX, mouseY):
             elif component.startswith('appConfirmPlate_'):
                 mealType = component.split('_')[1]
                 key = (app.selectedDay, mealType)
-                if key in app.tempPlates and len(app.tempPlates[key].plate) > 0:
+                if key in app.tempPlates and not app.tempPlates[key].isEmpty():
                     app.weekPlan.setMealPlate(app.selectedDay, app.tempPlates[key], mealType)
                 if key in app.tempPlates:
                     del app.tempPlates[key]
@@ -1163,7 +1560,15 @@ def weeklySchedule_onMousePress(app, mouseX, mouseY):
                 app.selectedMealType = mealType
                 setActiveScreen('weeklySchedule')
             elif component == 'confirm' and app.weekPlan.allDaysComplete():
+                saveSelectedAvatar(app)
                 setActiveScreen('simulation')
+    if app.autoPlanButton.isClicked(mouseX, mouseY):
+        autoPlanMeals(app)
+    app.planHistory.record()
+    if app.undoButton.isClicked(mouseX, mouseY):
+        undoPlanEdit(app)
+    elif app.redoButton.isClicked(mouseX, mouseY):
+        redoPlanEdit(app)
     if app.showOrHideDailyInfoButton.isClicked(mouseX, mouseY):
         if app.showOrHideDailyInfoButton.label == 'Hide Daily Info':
             app.showDailyInfo = not app.showDailyInfo
@@ -1176,17 +1581,36 @@ def weeklySchedule_onMousePress(app, mouseX, mouseY):
         setActiveScreen('viewRoutine')
     if app.exerciseRoutineConfirmButton.isClicked(mouseX, mouseY):
         app.isExerciseConfirmed[app.selectedDay] = not app.isExerciseConfirmed[app.selectedDay]
+    app.weekPlan.refreshCache()
+
+def autoPlanMeals(app):
+    # plans every meal of the week to keep the avatar at its current weight over 3 months,
+    # counting the exercise already in the week
+    if app.mealPlanner is None:
+        app.mealPlanner = MealPlanner(app.foodMenu, app.breakfastMenu)
+    avatar = avatarArchive.avatars[app.selectedAvatarIndex]
+    sim = DynamicSimulationConfig(app.simDaysPerHorizon[3], app.weekPlan, avatar)
+    app.mealPlanner.planWeek(sim.computeDailyIntakeTarget(avatar.weight), app.weekPlan)
+    app.tempPlates.clear()
+    app.tempServingNums.clear()
+
+def weeklySchedule_onScreenActivate(app):
+    # the schedule only reads the plan's cached totals; they are filled here and after each edit
+    # on this screen, since filling them while drawing would change the model in the view
+    app.weekPlan.refreshCache()
 
 def weeklySchedule_redrawAll(app):
     drawWeeklyScheduleScreen(app)
     
+def weeklySchedule_onKeyPress(app, key, modifiers):
+    if 'control' in modifiers and key == 'z':
+        undoPlanEdit(app)
+    elif 'control' in modifiers and key == 'y':
+        redoPlanEdit(app)
+    app.weekPlan.refreshCache()
+    
 def weeklySchedule_onMouseMove(app, mouseX, mouseY):
-    for key, button in app.weeklyScheduleButtons.items():
-        if key in ['breakfast', 'lunch', 'dinner', 'exercise', 'confirm']:
-            if button.doesHover(mouseX, mouseY):
-                button.backgroundColor = 'yellow'
-            else:
-                button.backgroundColor = 'lightGray'
+    app.hoverManagers['weeklySchedule'].move(mouseX, mouseY)
     app.dayHoverIndex = None
     for i, (x, y, w, h) in enumerate(app.dayCells):
         if (x < mouseX < x + w and y < mouseY < y + h and app.days[i] != app.selectedDay and not 
@@ -1208,17 +1632,14 @@ def category_onMousePress(app, mouseX, mouseY):
                 setActiveScreen('viewPlate')
             else:
                 app.selectedCategory = button.label
-                app.foodCells = []
                 app.foodItemSelected = None
+                app.foodQuery = ''
+                app.foodPage = 0
                 buildFoodCellGrid(app, app.selectedCategory)
                 setActiveScreen('plateBuilder')
     
 def category_onMouseMove(app, mouseX, mouseY):
-    for button in app.categoryButtons:
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'lightYellow'
-        else:
-            button.backgroundColor = 'lightGray'
+    app.hoverManagers['category'].move(mouseX, mouseY)
             
 # Plate Builder
 
@@ -1226,10 +1647,10 @@ def plateBuilder_redrawAll(app):
     drawPlateBuilderScreen(app)
         
 def plateBuilder_onMousePress(app, mouseX, mouseY):
-    for cell in app.foodCells:
-        if cell.foodCellisClicked(mouseX, mouseY) and cell.foodItem == app.foodItemSelected:
+    for cell in app.foodCellGrid.query(mouseX, mouseY):
+        if cell.foodItem == app.foodItemSelected:
             app.isServingToggleButtonDrawn = False
-        elif cell.foodCellisClicked(mouseX, mouseY):
+        else:
             app.foodItemSelected = cell.getFoodItem()
             app.isServingToggleButtonDrawn = True
     for button in app.plateBuilderButtons:
@@ -1260,26 +1681,33 @@ def plateBuilder_onMousePress(app, mouseX, mouseY):
                 setActiveScreen('viewPlate')
             elif button.label == 'Back':
                 setActiveScreen('category')
+    for button in app.foodPageButtons:
+        if button.isClicked(mouseX, mouseY) and (app.foodPage > 0 or app.hasNextFoodPage):
+            if button.actionId == 'prevPage' and app.foodPage > 0:
+                app.foodPage -= 1
+                buildFoodCellGrid(app, app.selectedCategory)
+            elif button.actionId == 'nextPage' and app.hasNextFoodPage:
+                app.foodPage += 1
+                buildFoodCellGrid(app, app.selectedCategory)
     if app.backPlateButton.isClicked(mouseX, mouseY): setActiveScreen('category')
     if app.viewPlateFromBuilderButton.isClicked(mouseX, mouseY):
         app.viewPlateReturnScreen = 'plateBuilder'
         setActiveScreen('viewPlate')
         
 def plateBuilder_onMouseMove(app, mouseX, mouseY):
-    for button in app.plateBuilderButtons:
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'yellow'
-        else:
-            button.backgroundColor = 'lightGray'
-    for cell in app.foodCells:
-        if cell.foodCellDoesHover(mouseX, mouseY):
-            cell.backgroundColor = 'yellow'
-        else:
-            cell.backgroundColor = 'lightGray'
-    if app.backPlateButton.doesHover(mouseX, mouseY): 
-        app.backPlateButton.backgroundColor = 'yellow'
+    app.hoverManagers['plateBuilder'].move(mouseX, mouseY)
+            
+def plateBuilder_onKeyPress(app, key):
+    if key == 'backspace':
+        app.foodQuery = app.foodQuery[:-1]
+    elif key == 'space':
+        app.foodQuery += ' '
+    elif len(key) == 1:
+        app.foodQuery += key
     else:
-        app.backPlateButton.backgroundColor = 'wheat'
+        return
+    app.foodPage = 0
+    buildFoodCellGrid(app, app.selectedCategory)
         
 # Exercise
     
@@ -1287,22 +1715,7 @@ def exerciseRoutine_redrawAll(app):
    drawExerciseRoutineScreen(app)
     
 def exerciseRoutine_onMouseMove(app, mouseX, mouseY):
-    for button in app.exerciseButtons:
-        button.backgroundColor = 'lightGray'
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'lightYellow'
-    for button in app.exerciseToggleButtons:
-        button.backgroundColor = 'lightGray'
-        if button.doesHover(mouseX, mouseY):
-            button.backgroundColor = 'yellow'
-    if app.exerciseRoutineAddButton.doesHover(mouseX, mouseY):
-        app.exerciseRoutineAddButton.backgroundColor = 'orange'
-    else:
-        app.exerciseRoutineAddButton.backgroundColor = 'red'
-    if app.exerciseRoutineBackButton.doesHover(mouseX, mouseY):
-        app.exerciseRoutineBackButton.backgroundColor = 'yellow'
-    else:
-        app.exerciseRoutineBackButton.backgroundColor = 'wheat'
+    app.hoverManagers['exerciseRoutine'].move(mouseX, mouseY)
         
 def exerciseRoutine_onMousePress(app, mouseX, mouseY):
     for button in app.exerciseButtons:
@@ -1316,9 +1729,10 @@ def exerciseRoutine_onMousePress(app, mouseX, mouseY):
             newSession = ExerciseSession(
                 app.selectedExerciseType,
                 app.exerciseDuration,
-                app.avatars[app.selectedAvatarIndex]
+                avatarArchive.avatars[app.selectedAvatarIndex]
             )
             app.weekPlan.addExercise(app.selectedDay, newSession)
+            app.planHistory.record()
     if app.exerciseRoutineConfirmButton.isClicked(mouseX, mouseY):
         app.isExerciseConfirmed[app.selectedDay] = True
         setActiveScreen('weeklySchedule')
@@ -1337,16 +1751,16 @@ def viewPlate_redrawAll(app):
         plate = app.tempPlates[key]
     else:
         plate = app.weekPlan.getMealPlate(app.selectedDay, app.selectedMealType)
-    if plate is None or plate.plate == dict():
+    if plate is None or plate.isEmpty():
         drawLabel('Your plate has nothing in it!', 600, 200, size = 20, fill = 'red', font = 'montserrat')
         app.viewPlateBackButton.draw(app)
     else:
         y = 150
-        for foodItem, servings in plate.plate.items():
+        for foodItem, servings in plate.getItems():
             drawLabel(f'{foodItem.foodName} | {servings} servings | {foodItem.kcalPerServ * servings} kcal',
                       600, y, size = 18, font = 'montserrat')
             y += 40
-        drawLabel(f'Total: {plate.totalkCal} kCals', 600, y + 20, size = 22, fill = 'blue', font = 'montserrat')
+        drawLabel(f'Total: {plate.getTotalkCal()} kCals', 600, y + 20, size = 22, fill = 'blue', font = 'montserrat')
         app.viewPlateBackButton.draw(app)
     if app.weekPlan.getMealPlate(app.selectedDay, app.selectedMealType) != None:
         if not hasConfirmedPlateForWeek(app, app.selectedMealType):
@@ -1358,6 +1772,7 @@ def viewPlate_onMousePress(app, mouseX, mouseY):
     if app.setPlateForWeekButton.isClicked(mouseX, mouseY):
         plate = app.weekPlan.getMealPlate(app.selectedDay, app.selectedMealType)
         app.weekPlan.setSamePlateForWeek(app, plate, app.selectedMealType)
+        app.planHistory.record()
         if app.selectedMealType == 'breakfast': app.hasConfirmPlateForWeekBeenPressedB = True
         elif app.selectedMealType == 'lunch': app.hasConfirmPlateForWeekBeenPressedL = True
         elif app.selectedMealType == 'dinner': app.hasConfirmPlateForWeekBeenPressedD = True
@@ -1391,10 +1806,16 @@ def viewRoutine_onMousePress(app, mouseX, mouseY):
     if app.isExerciseConfirmed[app.selectedDay] and app.setRoutineForWeekButton.isClicked(mouseX, mouseY):
         exercises = app.weekPlan.getExercises(app.selectedDay)
         app.weekPlan.setSameRoutineForWeek(app, exercises)
+        app.planHistory.record()
         app.hasSetRoutineForWeekBeenPressed = True
         
         
 def main():
+    global activeProfiler
+    if '--profile' in sys.argv[1:]:
+        import profiler
+        activeProfiler = profiler.install(globals())
     runAppWithScreens(initialScreen = 'menu', width = 1200, height = 700)
 
-main()
+if __name__ == '__main__':
+    main()
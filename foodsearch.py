@@ -0,0 +1,154 @@
+'''
+FOOD SEARCH
+
+Loads large food catalogs (CSV or JSON) into the same menu layout as app.foodMenu and
+app.breakfastMenu, and answers as-you-type searches over a menu category.
+
+CSV files need name, kcal and category columns; JSON files are a list of objects with the same
+keys. An optional meal column ('breakfast', 'lunch', 'dinner' or 'main') puts the food on only
+one of the two menus, otherwise it goes on both.
+'''
+
+import csv
+import heapq
+import json
+from bisect import bisect_left
+from collections import Counter
+
+from model import FoodItem, foodCatalog
+
+menuKeysByCategory = {'Beverage': 'Beverages'}
+breakfastMeals = {'', 'any', 'breakfast'}
+mainMeals = {'', 'any', 'lunch', 'dinner', 'main'}
+
+# Loading
+
+def readFoodRows(path):
+    if path.endswith('.json'):
+        with open(path) as f:
+            for row in json.load(f):
+                yield row
+    else:
+        with open(path, newline = '') as f:
+            for row in csv.DictReader(f):
+                yield row
+
+def parsekCal(value):
+    kcal = float(value)
+    return int(kcal) if kcal.is_integer() else kcal
+
+def loadFoodMenus(path, catalog = foodCatalog):
+    foodMenu, breakfastMenu = dict(), dict()
+    for row in readFoodRows(path):
+        category = row['category']
+        foodItem = catalog.intern(FoodItem(row['name'], parsekCal(row['kcal']), category))
+        menuKey = menuKeysByCategory.get(category, category)
+        meal = (row.get('meal') or '').strip().lower()
+        if meal in breakfastMeals:
+            breakfastMenu.setdefault(menuKey, []).append(foodItem)
+        if meal in mainMeals:
+            foodMenu.setdefault(menuKey, []).append(foodItem)
+    return foodMenu, breakfastMenu
+
+def mergeMenus(menu, extraMenu):
+    for menuKey, foodList in extraMenu.items():
+        menu.setdefault(menuKey, []).extend(foodList)
+
+# Searching
+
+def getTrigrams(text):
+    padded = f' {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class FoodSearchIndex:
+
+    # Every query word has to be the start of a word in the name ('bro ric' finds 'Brown Rice'),
+    # using a sorted list of (word, position) pairs and bisect. A query that no name matches that
+    # way is matched as a whole by shared trigrams instead, which catches typos ('spinich').
+
+    def __init__(self, foodList):
+        self.foodList = foodList
+        self.nameWords = []
+        self.words = []
+        self.trigrams = dict()
+        for position, foodItem in enumerate(foodList):
+            name = foodItem.foodName.lower()
+            self.nameWords.append(tuple(name.split()))
+            for word in set(self.nameWords[-1]):
+                self.words.append((word, position))
+            for trigram in getTrigrams(name):
+                self.trigrams.setdefault(trigram, []).append(position)
+        self.words.sort()
+        # the food of every entry of words, for slicing a word range without the tuples
+        self.positions = [position for word, position in self.words]
+
+    def getWordRange(self, prefix):
+        start = bisect_left(self.words, (prefix,))
+        end = bisect_left(self.words, (prefix + '\uffff',))
+        return start, end
+
+    def walkRange(self, start, end, limit):
+        # foods of one word range in index order, stopping once there are enough
+        positions, seen = [], set()
+        for i in range(start, end):
+            position = self.positions[i]
+            if position not in seen:
+                seen.add(position)
+                positions.append(position)
+                if len(positions) == limit:
+                    break
+        return positions
+
+    def intersectRanges(self, ranges, checkRatio = 50):
+        # Intersects the foods of each word range, starting with the smallest range, so the work
+        # is bounded by the rarest word rather than the catalog. Once the candidates are few
+        # compared to the next range, the remaining words are checked against their names
+        # instead. Empty as soon as no food has every word so far.
+        ranges = sorted(ranges, key = lambda r: r[1] - r[0])
+        start, end, word = ranges[0]
+        candidates = set(self.positions[start:end])
+        for start, end, word in ranges[1:]:
+            if not candidates:
+                break
+            if len(candidates) * checkRatio < end - start:
+                candidates = {position for position in candidates
+                              if any(nameWord.startswith(word) for nameWord in self.nameWords[position])}
+            else:
+                candidates = candidates.intersection(self.positions[start:end])
+        return candidates
+
+    def fuzzySearch(self, words, limit, trigramsPerWord = 2):
+        # only the rarest few trigrams of each word are counted, which keeps long queries cheap
+        # while every word still has a say in the ranking
+        postings = []
+        for word in words:
+            wordPostings = [self.trigrams[trigram] for trigram in getTrigrams(word) if trigram in self.trigrams]
+            postings += sorted(wordPostings, key = len)[:trigramsPerWord]
+        counts = Counter()
+        for posting in postings:
+            counts.update(posting)
+        minShared = min(2, len(postings))
+        positions = []
+        for position, shared in counts.most_common(limit):
+            if shared < minShared:
+                break
+            positions.append(position)
+        return positions
+
+    def search(self, query, limit = 10):
+        # asking for one more than a page tells the caller whether there is a next page
+        query = ' '.join(query.lower().split())
+        if query == '':
+            return self.foodList[:limit]
+        words = query.split()
+        ranges = [self.getWordRange(word) + (word,) for word in words]
+        if len(ranges) == 1:
+            positions = self.walkRange(ranges[0][0], ranges[0][1], limit)
+        elif all(start < end for start, end, word in ranges):
+            positions = heapq.nsmallest(limit, self.intersectRanges(ranges))
+        else:
+            # a word that starts no word in any name means no food has all of them
+            positions = []
+        if positions == [] and len(query) >= 3:
+            positions = self.fuzzySearch(words, limit)
+        return [self.foodList[position] for position in positions]
@@ -0,0 +1,166 @@
+'''
+LOG IMPORT
+
+Turns exported food and exercise logs into WeekPlans. Files are CSV or JSONL (one JSON object
+per line) and are read one row at a time and turned into one week at a time, so memory grows with
+the number of distinct foods in an export (each is interned in foodCatalog), not with its size.
+Several files (say a food log and a workout log) are merged by date as they are read.
+
+Every row needs a date (or an ISO timestamp). Food rows have food, kcal and optionally category,
+servings and meal; exercise rows have exercise (a type from exerciseRegistry, in any case) and
+duration (minutes).
+
+    date,meal,food,kcal,servings
+    2024-03-04,breakfast,Bagel,250,1
+    2024-03-04,,Spaghetti,360,1.5
+
+    {"timestamp": "2024-03-04T18:30:00", "exercise": "running", "duration": 30}
+
+Rows without a meal go by the hour of their timestamp, or to dinner. Plates store whole servings,
+so the fractions of servings in a meal are added up in kcal and stored as servings of one shared
+1-kcal 'Partial servings' food. Logs have to be in date order, which exports are.
+
+    for monday, weekPlan in importWeeks(['food.csv', 'workouts.jsonl'], avatar): ...
+    typicalWeek = importTypicalWeek(['food.csv', 'workouts.jsonl'], avatar)
+'''
+
+import csv
+import heapq
+import json
+from datetime import datetime, timedelta
+
+from model import FoodItem, Plate, ExerciseSession, WeekPlan, exerciseRegistry, foodCatalog, packItems
+
+weekDays = ['Mon', 'Tues', 'Wed', 'Thurs', 'Fri', 'Sat', 'Sun']
+mealTypes = ['breakfast', 'lunch', 'dinner']
+mealAliases = {'brunch': 'lunch', 'supper': 'dinner', 'snack': 'dinner', 'snacks': 'dinner'}
+partialServings = foodCatalog.intern(FoodItem('Partial servings', 1, None))
+
+# Reading logs
+
+def readLogRows(path):
+    with open(path, newline = '') as f:
+        if path.endswith('.jsonl') or path.endswith('.ndjson'):
+            for line in f:
+                if line.strip() != '':
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(f):
+                yield row
+
+def getMealType(meal, timestamp):
+    meal = (meal or '').strip().lower()
+    meal = mealAliases.get(meal, meal)
+    if meal in mealTypes:
+        return meal
+    if timestamp is not None:
+        if timestamp.hour < 11: return 'breakfast'
+        elif timestamp.hour < 16: return 'lunch'
+    return 'dinner'
+
+def parseEntry(row):
+    # (date, 'food', (mealType, foodItem, servings)) or (date, 'exercise', (typeOf, duration))
+    value = str(row.get('date') or row.get('timestamp') or '').strip()
+    if value == '':
+        raise ValueError('log row has no date')
+    timestamp = datetime.fromisoformat(value)
+    hasTime = len(value) > 10
+    if row.get('food') not in (None, ''):
+        kcal = float(row['kcal'])
+        servings = float(row.get('servings') or 1)
+        if not 0 < servings < float('inf'):
+            raise ValueError(f'servings must be a positive number, not {servings}')
+        kcal = int(kcal) if kcal.is_integer() else kcal
+        foodItem = FoodItem(row['food'], kcal, row.get('category') or None)
+        mealType = getMealType(row.get('meal'), timestamp if hasTime else None)
+        return timestamp.date(), 'food', (mealType, foodItem, int(servings) if servings.is_integer() else servings)
+    if row.get('exercise') not in (None, ''):
+        # checked here rather than when the plan is simulated, so the error can name the entry
+        typeOf = str(row['exercise']).strip().lower()
+        exerciseRegistry.getRate(typeOf)
+        duration = float(row['duration'])
+        return timestamp.date(), 'exercise', (typeOf, int(duration) if duration.is_integer() else duration)
+    raise ValueError('log row is neither food nor exercise')
+
+def readEntries(path):
+    for lineNum, row in enumerate(readLogRows(path), 1):
+        try:
+            yield parseEntry(row)
+        except (KeyError, ValueError) as error:
+            raise ValueError(f'{path}, entry {lineNum}: {error}') from None
+
+def mergeEntries(paths):
+    # one date-ordered stream out of date-ordered files
+    lastDate = None
+    for entry in heapq.merge(*[readEntries(path) for path in paths], key = lambda entry: entry[0]):
+        if lastDate is not None and entry[0] < lastDate:
+            raise ValueError(f'logs are not in date order ({entry[0]} after {lastDate})')
+        lastDate = entry[0]
+        yield entry
+
+# Building plans
+
+def addEntry(weekPlan, meals, day, kind, payload, avatar):
+    # food goes into meals, (day, mealType) -> {foodId: servings}, which fillMeals turns into
+    # plates once the week is read, so a plate is packed once rather than on every entry. The
+    # kcal of partial servings is summed under the key None.
+    if kind == 'food':
+        mealType, foodItem, servings = payload
+        servingsByFood = meals.setdefault((day, mealType), dict())
+        wholeServings = int(servings)
+        if wholeServings > 0:
+            foodId = foodCatalog.intern(foodItem).foodId
+            servingsByFood[foodId] = servingsByFood.get(foodId, 0) + wholeServings
+        if servings != wholeServings:
+            servingsByFood[None] = servingsByFood.get(None, 0) + foodItem.kcalPerServ * (servings - wholeServings)
+    else:
+        typeOf, duration = payload
+        weekPlan.addExercise(day, ExerciseSession(typeOf, duration, avatar))
+
+def fillMeals(weekPlan, meals):
+    for (day, mealType), servingsByFood in meals.items():
+        partialkCal = round(servingsByFood.pop(None, 0))
+        if partialkCal > 0:
+            servingsByFood[partialServings.foodId] = partialkCal
+        weekPlan.setMealPlate(day, Plate(packItems(servingsByFood.items())), mealType)
+    return weekPlan
+
+def importWeeks(paths, avatar):
+    # yields (monday, WeekPlan) for every calendar week with entries, holding one week at a time
+    weekStart, weekPlan, meals = None, None, None
+    for entryDate, kind, payload in mergeEntries(paths):
+        monday = entryDate - timedelta(days = entryDate.weekday())
+        if monday != weekStart:
+            if weekPlan is not None:
+                yield weekStart, fillMeals(weekPlan, meals)
+            weekStart, weekPlan, meals = monday, WeekPlan(), dict()
+        addEntry(weekPlan, meals, weekDays[entryDate.weekday()], kind, payload, avatar)
+    if weekPlan is not None:
+        yield weekStart, fillMeals(weekPlan, meals)
+
+def importTypicalWeek(paths, avatar):
+    # Every weekday gets the average kcal of each meal and the average minutes of each exercise
+    # type over the logged days falling on that weekday. Only the sums are kept while reading.
+    numOfDays = [0] * 7
+    kcalSums = dict()
+    minuteSums = dict()
+    lastDate = None
+    for entryDate, kind, payload in mergeEntries(paths):
+        weekday = entryDate.weekday()
+        if entryDate != lastDate:
+            numOfDays[weekday] += 1
+            lastDate = entryDate
+        if kind == 'food':
+            mealType, foodItem, servings = payload
+            key = (weekday, mealType)
+            kcalSums[key] = kcalSums.get(key, 0) + foodItem.kcalPerServ * servings
+        else:
+            typeOf, duration = payload
+            minuteSums[(weekday, typeOf)] = minuteSums.get((weekday, typeOf), 0) + duration
+    weekPlan, meals = WeekPlan(), dict()
+    for (weekday, mealType), kcal in kcalSums.items():
+        foodItem = FoodItem(f'Typical {mealType}', kcal / numOfDays[weekday], None)
+        addEntry(weekPlan, meals, weekDays[weekday], 'food', (mealType, foodItem, 1), avatar)
+    for (weekday, typeOf), minutes in minuteSums.items():
+        addEntry(weekPlan, meals, weekDays[weekday], 'exercise', (typeOf, minutes / numOfDays[weekday]), avatar)
+    return fillMeals(weekPlan, meals)
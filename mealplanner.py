@@ -0,0 +1,104 @@
+'''
+MEAL PLANNER
+
+Fills a WeekPlan with breakfast, lunch and dinner plates that add up to a daily kcal target,
+using foods from app.foodMenu (lunch and dinner) and app.breakfastMenu (breakfast). Every plate
+gets one food from each category with a bounded number of servings, so picking a plate is a
+multiple-choice bounded knapsack over the kcal total.
+
+    planner = MealPlanner(app.foodMenu, app.breakfastMenu)
+    target = DynamicSimulationConfig(91, weekPlan, avatar).computeDailyIntakeTarget(goalWeight)
+    weekPlan = planner.planWeek(target, weekPlan)
+'''
+
+from model import Plate, WeekPlan
+
+mealShares = {'breakfast': 0.25, 'lunch': 0.35, 'dinner': 0.4}
+maxServingsByCategory = {'Carbs': 2, 'Protein': 2, 'Veggies': 2, 'Beverages': 1}
+
+class MealPlanner:
+
+    # kcal totals are counted in steps of kCalStep, so a category with thousands of foods has at
+    # most a few hundred distinct totals. Each category keeps one short list of (food, servings)
+    # choices per total, and the reachable plate totals after each category are the bits of a
+    # Python int, so adding a category is one shift-or per distinct total instead of a loop over
+    # every food.
+
+    def __init__(self, foodMenu, breakfastMenu, maxServings = maxServingsByCategory,
+                 kCalStep = 10, choicesPerTotal = 7):
+        self.menus = {'breakfast': breakfastMenu, 'lunch': foodMenu, 'dinner': foodMenu}
+        self.maxServings = maxServings
+        self.kCalStep = kCalStep
+        self.choicesPerTotal = choicesPerTotal
+        self.options = dict()
+
+    def getOptions(self, mealType, category):
+        # options[steps] is a list of (foodItem, servings) whose kcal rounds to that many steps
+        menu = self.menus[mealType]
+        key = (id(menu), category)
+        if key not in self.options:
+            options = dict()
+            for foodItem in menu.get(category, []):
+                for servings in range(1, self.maxServings[category] + 1):
+                    steps = round(foodItem.kcalPerServ * servings / self.kCalStep)
+                    choices = options.setdefault(steps, [])
+                    if len(choices) < self.choicesPerTotal:
+                        choices.append((foodItem, servings))
+            self.options[key] = options
+        return self.options[key]
+
+    def getReachable(self, mealType, limit):
+        # reachable[k] has bit t set when the first k categories can add up to t steps
+        mask = (1 << (limit + 1)) - 1
+        reachable = [1]
+        for category in self.maxServings:
+            options = self.getOptions(mealType, category)
+            if options == dict():
+                continue
+            previous = reachable[-1]
+            current = 0
+            for steps in options:
+                if steps <= limit:
+                    current |= previous << steps
+            reachable.append(current & mask)
+        return reachable
+
+    def findClosestTotal(self, reachable, target, limit):
+        for distance in range(limit + 1):
+            for total in (target - distance, target + distance):
+                if 0 <= total <= limit and (reachable >> total) & 1:
+                    return total
+        return None
+
+    def planMeal(self, mealType, kCalTarget, variant = 0):
+        # variant rotates through the equally good choices so each day of the week differs
+        target = max(0, round(kCalTarget / self.kCalStep))
+        limit = 2 * target + 1
+        reachable = self.getReachable(mealType, limit)
+        total = self.findClosestTotal(reachable[-1], target, limit)
+        plate = Plate()
+        if total is None:
+            return plate
+        categories = [category for category in self.maxServings
+                      if self.getOptions(mealType, category) != dict()]
+        for k in range(len(categories) - 1, -1, -1):
+            options = self.getOptions(mealType, categories[k])
+            stepsList = sorted(options)
+            for i in range(len(stepsList)):
+                steps = stepsList[(i + variant) % len(stepsList)]
+                if steps <= total and (reachable[k] >> (total - steps)) & 1:
+                    choices = options[steps]
+                    foodItem, servings = choices[variant % len(choices)]
+                    plate.addFoodItem(foodItem, servings)
+                    total -= steps
+                    break
+        return plate
+
+    def planWeek(self, dailyTarget, weekPlan = None):
+        # meals go into weekPlan when given (keeping its exercise), otherwise into a new one
+        if weekPlan is None:
+            weekPlan = WeekPlan()
+        for variant, day in enumerate(weekPlan.week):
+            for mealType, share in mealShares.items():
+                weekPlan.setMealPlate(day, self.planMeal(mealType, dailyTarget * share, variant), mealType)
+        return weekPlan
@@ -0,0 +1,819 @@
+'''
+MODEL
+
+Avatars, plates, day/week plans and the weight simulations. Nothing in here imports cmu_graphics,
+so the model can be used headless (see batch.py and cohort.py). final.py builds the screens on top
+of it.
+'''
+
+from array import array
+
+# Classes
+
+def getBurnFactor(weight):
+    avatarWeight = weight * 0.453
+    return round((avatarWeight / 50), 3)
+
+class Avatar:
+    
+    def __init__(self, name, age = None, sex = None, height = None, weight = None):
+        self.name = name
+        self.age = age
+        self.sex = sex
+        self.height = height
+        self.weight = weight
+        self.bmi = None
+        
+    def updateBmi(self):
+        if self.height is None or self.weight is None or self.height == 0:
+            self.bmi = None
+            return
+        weightKg = self.weight / 2.205
+        heightM = self.height * 0.0254
+        rawBmi = weightKg / (heightM ** 2)
+        sexFactor = 0
+        if self.sex == 'male':
+            sexFactor = -0.5
+        elif self.sex == 'female':
+            sexFactor = 0.5
+        ageFactor = 0
+        if self.age is not None and self.age > 30:
+            ageFactor = 0.03 * (self.age - 30)
+        self.bmi = rawBmi + sexFactor + ageFactor
+        
+    def getBurnFactor(self):
+        return getBurnFactor(self.weight)
+        
+    def computeBmr(self, weight = None):
+        # Mifflin-St Jeor, converted from lbs/inches
+        if weight is None: weight = self.weight
+        weightKg = weight / 2.205
+        heightCm = self.height * 2.54
+        if self.sex == 'male': sexOffset = 5
+        elif self.sex == 'female': sexOffset = -161
+        else: sexOffset = -78
+        return 10 * weightKg + 6.25 * heightCm - 5 * self.age + sexOffset
+        
+    def displayAge(self):
+        if self.age != None:
+            return f'Age: {self.age} years old'
+        else:
+            return 'Age: ---'
+            
+    def getAvatarName(self):
+        return self.name
+        
+    def displaySex(self):
+        if self.sex != None:
+            return f'Sex: {self.sex}'
+        else:
+            return 'Sex: ---'
+        
+    def displayWeight(self):
+        if self.weight != None:
+            return f'Weight: {self.weight} lbs'
+        else:
+            return 'Weight: ---'
+        
+    def displayHeight(self):
+        if self.height != None:
+            return f'Height: {self.height} inches'
+        else:
+            return 'Height: ---'
+            
+    def displayBmi(self):
+        if self.bmi == None:
+            return 'Adjust settings to calculate your BMI!'
+        else:
+            return f'BMI: {self.bmi}'
+     
+class FoodItem:
+    
+    __slots__ = ('foodName', 'kcalPerServ', 'category', 'foodId')
+    
+    def __init__(self, foodName, kcalPerServ, category):
+        self.foodName = foodName
+        self.kcalPerServ = kcalPerServ
+        self.category = category
+        self.foodId = None
+        
+    def __eq__(self, other):
+        if isinstance(other, FoodItem):
+            return self.foodName == other.foodName and self.category == other.category
+            
+    def __hash__(self):
+        return hash((self.foodName, self.category))
+        
+    def getkCalPerServ(self):
+        return self.kcalPerServ
+        
+class FoodCatalog:
+    
+    # Interns FoodItems so each distinct (name, category, kcal) exists once and has an integer id.
+    # Plates store those ids instead of references to FoodItem objects.
+    
+    def __init__(self):
+        self.items = []
+        self.idsByKey = dict()
+        
+    def getKey(self, foodItem):
+        return (foodItem.foodName, foodItem.category, foodItem.kcalPerServ)
+        
+    def intern(self, foodItem):
+        if foodItem.foodId is not None and self.items[foodItem.foodId] is foodItem:
+            return foodItem
+        key = self.getKey(foodItem)
+        if key in self.idsByKey:
+            return self.items[self.idsByKey[key]]
+        foodItem.foodId = len(self.items)
+        self.idsByKey[key] = foodItem.foodId
+        self.items.append(foodItem)
+        return foodItem
+        
+    def internMenu(self, menu):
+        return {category: [self.intern(foodItem) for foodItem in foodList]
+                for category, foodList in menu.items()}
+        
+    def findId(self, foodItem):
+        return self.idsByKey.get(self.getKey(foodItem))
+        
+    def getFoodItem(self, foodId):
+        return self.items[foodId]
+        
+foodCatalog = FoodCatalog()
+        
+def packItems(pairs):
+    # (foodId, servings) pairs as unsigned varints, so ids and servings under 128 take one byte each
+    data = bytearray()
+    for pair in pairs:
+        for value in pair:
+            while value >= 0x80:
+                data.append(value & 0x7f | 0x80)
+                value >>= 7
+            data.append(value)
+    return bytes(data)
+    
+def unpackItems(data):
+    if data.isascii():
+        # every byte below 0x80, so each value is one byte
+        return list(zip(data[0::2], data[1::2]))
+    values, value, shift = [], 0, 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value, shift = 0, 0
+    return list(zip(values[0::2], values[1::2]))
+    
+def getPlateTotalkCal(data):
+    return sum(foodCatalog.getFoodItem(foodId).kcalPerServ * servings for foodId, servings in unpackItems(data))
+    
+class Plate:
+    
+    # The editable form of a plate. data is the plate's (foodId, servings) pairs from foodCatalog
+    # packed by packItems into immutable bytes, and that value is all a DayPlan stores: a stored
+    # 4-item plate is one 41-byte bytes object and equal plates share it. A Plate from
+    # getPlateForEdit knows its day and meal and writes every edit back to them.
+    
+    __slots__ = ('data', 'dayPlan', 'mealType')
+    
+    def __init__(self, data = b'', dayPlan = None, mealType = None):
+        self.data = data
+        self.dayPlan = dayPlan
+        self.mealType = mealType
+        
+    def setItems(self, pairs):
+        self.data = packItems(pairs)
+        if self.dayPlan is not None:
+            self.dayPlan.setPlate(self, self.mealType)
+        
+    def addFoodItem(self, foodItem, servingNum):
+        foodItem = foodCatalog.intern(foodItem)
+        pairs = unpackItems(self.data)
+        for index, (foodId, servings) in enumerate(pairs):
+            if foodId == foodItem.foodId:
+                pairs[index] = (foodId, servings + servingNum)
+                break
+        else:
+            pairs.append((foodItem.foodId, servingNum))
+        self.setItems(pairs)
+            
+    def removeFoodItem(self, foodItem, servingNum):
+        foodId = foodCatalog.findId(foodItem)
+        pairs = unpackItems(self.data)
+        for index, (itemId, servings) in enumerate(pairs):
+            if itemId == foodId:
+                if servingNum >= servings:
+                    del pairs[index]
+                else:
+                    pairs[index] = (itemId, servings - servingNum)
+                self.setItems(pairs)
+                return
+            
+    def getItems(self):
+        return [(foodCatalog.getFoodItem(foodId), servings) for foodId, servings in unpackItems(self.data)]
+                
+    def getNumOfItems(self):
+        return len(unpackItems(self.data))
+        
+    def isEmpty(self):
+        return len(self.data) == 0
+        
+    def getTotalkCal(self):
+        return getPlateTotalkCal(self.data)
+        
+    def toBytes(self):
+        return self.data
+        
+    def displayPlate(self):
+        return f'{self.getNumOfItems()} items, {self.getTotalkCal()} calories'
+        
+class PlateView(Plate):
+    
+    # A read-only plate, which is what DayPlan.getPlate and WeekPlan.getMealPlate give out: the
+    # same packed items may be stored for other days and meals, so edits go through
+    # getPlateForEdit or getMealPlateForEdit instead.
+    
+    __slots__ = ()
+    
+    def setItems(self, pairs):
+        raise TypeError('plate is read-only, use getPlateForEdit to change it')
+        
+class ExerciseRegistry:
+    
+    # A rate is kcal per minute for every 50 kg of body weight, which is MET * 0.875 (a MET burns
+    # 3.5 ml O2 per kg per minute, about 1 kcal per 200 of those). A burn is rate * duration *
+    # burn factor, which is cheaper to compute than to look up; what plans precompute is
+    # rate * duration per day (DayPlan.cachedBurnRates). version goes up with every register so
+    # those caches know when a rate changed under them.
+    
+    def __init__(self, rates = None):
+        self.rates = dict()
+        self.version = 0
+        for typeOf, rate in (rates or dict()).items():
+            self.register(typeOf, rate)
+            
+    def register(self, typeOf, rate = None, met = None):
+        if rate is None and met is None:
+            raise ValueError(f'exercise {typeOf!r} needs a rate or a MET value')
+        self.rates[typeOf] = rate if rate is not None else met * 0.875
+        self.version += 1
+        
+    def loadRates(self, path):
+        # CSV with name and rate (or met) columns, or a JSON list of objects with the same keys.
+        # The parsers are imported here since most runs only use the built-in rates.
+        import csv
+        import json
+        if path.endswith('.json'):
+            with open(path) as f:
+                rows = json.load(f)
+        else:
+            with open(path, newline = '') as f:
+                rows = list(csv.DictReader(f))
+        for row in rows:
+            rate, met = row.get('rate'), row.get('met')
+            self.register(row['name'], float(rate) if rate not in (None, '') else None,
+                          float(met) if met not in (None, '') else None)
+            
+    def getTypes(self):
+        return list(self.rates)
+        
+    def getRate(self, typeOf):
+        if typeOf not in self.rates:
+            raise ValueError(f'unknown exercise type {typeOf!r}')
+        return self.rates[typeOf]
+        
+    def getBurn(self, typeOf, duration, weight):
+        return self.getRate(typeOf) * duration * getBurnFactor(weight)
+        
+exerciseRegistry = ExerciseRegistry({'weightlifting': 5, 'running': 7, 'swimming': 12})
+        
+class ExerciseSession:
+    
+    def __init__(self, typeOf, duration, avatar):
+        self.typeOf = typeOf
+        self.duration = duration
+        self.avatar = avatar
+        
+    def baseRate(self):
+        return exerciseRegistry.getRate(self.typeOf)
+        
+    def caloriesBurnt(self):
+        return exerciseRegistry.getBurn(self.typeOf, self.duration, self.avatar.weight)
+        
+class DayPlan:
+    
+    # Intake, burn rate and completion are cached and only recomputed after markDirty, which
+    # setPlate and edits through getPlateForEdit call, or after exerciseRegistry's rates change.
+    # Burn is cached per avatar as baseRate * duration so getDailyBurnt still follows the avatar's
+    # current weight.
+    #
+    # Meals are stored as the packed bytes from Plate.toBytes and routines as tuples, so both can
+    # be shared between days (setSamePlateForWeek, setSameRoutineForWeek) and an edit replaces
+    # the value for one day only. getPlate gives a read-only PlateView of a meal.
+    
+    def __init__(self):
+        self.dayPlan = {'breakfast': None, 'lunch': None, 'dinner': None, 'exercise sessions': ()}
+        self.owners = []
+        self.isDirty = True
+        self.cachedIntake = 0
+        self.cachedBurnRates = dict()
+        self.cachedComplete = False
+        self.ratesVersion = None
+        self.version = None
+        
+    def addOwner(self, weekPlan):
+        if not any(owner is weekPlan for owner in self.owners):
+            self.owners.append(weekPlan)
+            
+    def removeOwner(self, weekPlan):
+        self.owners = [owner for owner in self.owners if owner is not weekPlan]
+        
+    def markDirty(self):
+        self.isDirty = True
+        self.version = None
+        for owner in self.owners:
+            owner.markDirty()
+            
+    def refreshCache(self):
+        if not self.isDirty and self.ratesVersion == exerciseRegistry.version: return
+        self.cachedIntake = 0
+        for mealType in ['breakfast', 'lunch', 'dinner']:
+            if self.dayPlan[mealType] != None:
+                self.cachedIntake += getPlateTotalkCal(self.dayPlan[mealType])
+        self.cachedBurnRates = dict()
+        for session in self.dayPlan['exercise sessions']:
+            rate = session.baseRate() * session.duration
+            self.cachedBurnRates[session.avatar] = self.cachedBurnRates.get(session.avatar, 0) + rate
+        self.cachedComplete = (self.dayPlan['breakfast'] is not None and self.dayPlan['lunch'] is not None and
+                               self.dayPlan['dinner'] is not None and len(self.dayPlan['exercise sessions']) > 0)
+        self.ratesVersion = exerciseRegistry.version
+        self.isDirty = False
+        
+    def setPlate(self, plate, mealType):
+        self.dayPlan[mealType] = None if plate is None else plate.toBytes()
+        self.markDirty()
+        
+    def getPlate(self, mealType):
+        data = self.dayPlan[mealType]
+        return None if data is None else PlateView(data)
+        
+    def getPlateForEdit(self, mealType):
+        # the plate to call addFoodItem/removeFoodItem on; its edits are stored for this day only
+        data = self.dayPlan[mealType]
+        return None if data is None else Plate(data, self, mealType)
+        
+    def addExercise(self, session):
+        self.dayPlan['exercise sessions'] = self.dayPlan['exercise sessions'] + (session,)
+        self.markDirty()
+        
+    def getExercise(self):
+        return self.dayPlan['exercise sessions']
+        
+    def setExerciseRoutine(self, exercises):
+        self.dayPlan['exercise sessions'] = tuple(exercises)
+        self.markDirty()
+        
+    def getDailyIntake(self):
+        self.refreshCache()
+        return self.cachedIntake
+        
+    def getDailyBurnt(self):
+        self.refreshCache()
+        totalBurn = 0
+        for avatar, rate in self.cachedBurnRates.items():
+            totalBurn += rate * avatar.getBurnFactor()
+        return totalBurn
+        
+    def getDailyBurnRate(self):
+        # kcal burnt per (lb * 0.453 / 50) of body weight, i.e. caloriesBurnt without the weight
+        self.refreshCache()
+        return sum(self.cachedBurnRates.values())
+            
+    def computeDailyCalorieBalance(self):
+        return self.getDailyIntake() - self.getDailyBurnt()
+        
+    def isCompleteDay(self):
+        self.refreshCache()
+        return self.cachedComplete
+        
+    def getVersion(self):
+        # (breakfast, lunch, dinner, sessions) with the packed plates, rebuilt only after an edit
+        if self.version is None:
+            plates = tuple(self.dayPlan[mealType] for mealType in ['breakfast', 'lunch', 'dinner'])
+            self.version = plates + (self.dayPlan['exercise sessions'],)
+        return self.version
+        
+    def restoreVersion(self, version):
+        # plates and routines are immutable values, so the snapshot's own are stored again
+        for mealType, data in zip(['breakfast', 'lunch', 'dinner'], version):
+            if self.dayPlan[mealType] is not data:
+                self.dayPlan[mealType] = data
+                self.markDirty()
+        if self.dayPlan['exercise sessions'] != version[3]:
+            self.setExerciseRoutine(version[3])
+        self.version = version
+            
+        
+class WeekPlan:
+    
+    def __init__(self):
+        self.week = {'Mon': DayPlan(), 'Tues': DayPlan(), 'Wed': DayPlan(), 'Thurs': DayPlan(), 
+                     'Fri': DayPlan(), 'Sat': DayPlan(), 'Sun': DayPlan()}
+        for day in self.week:
+            self.week[day].addOwner(self)
+        self.isDirty = True
+        self.cachedIntake = 0
+        self.cachedAllComplete = False
+        self.version = None
+        
+    def markDirty(self):
+        self.isDirty = True
+        self.version = None
+        
+    def refreshCache(self):
+        if not self.isDirty: return
+        self.cachedIntake = 0
+        self.cachedAllComplete = True
+        for day in self.week:
+            self.cachedIntake += self.week[day].getDailyIntake()
+            if not self.week[day].isCompleteDay():
+                self.cachedAllComplete = False
+        self.isDirty = False
+                     
+    def setDayPlan(self, day, dayPlan):
+        oldDayPlan = self.week[day]
+        self.week[day] = dayPlan
+        if not any(self.week[other] is oldDayPlan for other in self.week):
+            oldDayPlan.removeOwner(self)
+        dayPlan.addOwner(self)
+        self.markDirty()
+        
+    def getDayPlan(self, day):
+        return self.week[day]
+                     
+    def setMealPlate(self, day, plate, mealType):
+        self.week[day].setPlate(plate, mealType)
+        
+    def getMealPlate(self, day, mealType):
+        return self.week[day].getPlate(mealType)
+        
+    def getMealPlateForEdit(self, day, mealType):
+        return self.week[day].getPlateForEdit(mealType)
+        
+    def addExercise(self, day, session):
+        self.week[day].addExercise(session)
+        
+    def getExercises(self, day):
+        return self.week[day].getExercise()
+        
+    def setSameRoutineForWeek(self, app, exercises):
+        for day in self.week:
+            dayPlan = self.week[day]
+            dayPlan.setExerciseRoutine(exercises)
+            app.isExerciseConfirmed[day] = True
+            
+    def setSamePlateForWeek(self, app, plate, mealType):
+        for day in self.week:
+            dayPlan = self.week[day]
+            dayPlan.setPlate(plate, mealType)
+            app.tempPlates = dict()
+        
+    def computeWeeklyTotals(self):
+        self.refreshCache()
+        totalBurn = 0
+        for day in self.week:
+            totalBurn += self.week[day].getDailyBurnt()
+        return self.cachedIntake, totalBurn
+        
+    def isDayComplete(self, day):
+        return self.week[day].isCompleteDay()
+        
+    def allDaysComplete(self):
+        self.refreshCache()
+        return self.cachedAllComplete
+        
+    def getVersion(self):
+        # an immutable snapshot of the week. Days that did not change since the last snapshot
+        # give back the same tuple, so a snapshot costs one new tuple per edited day and plate.
+        if self.version is None:
+            self.version = tuple(self.week[day].getVersion() for day in self.week)
+        return self.version
+        
+    def restoreVersion(self, version):
+        for day, dayVersion in zip(self.week, version):
+            if self.week[day].getVersion() is not dayVersion:
+                self.week[day].restoreVersion(dayVersion)
+        self.version = version
+        
+    def getDailyColumns(self):
+        # (intake, burnRate) for Mon..Sun as arrays, burnRate as in DayPlan.getDailyBurnRate
+        intake = array('d', [self.week[day].getDailyIntake() for day in self.week])
+        burnRate = array('d', [self.week[day].getDailyBurnRate() for day in self.week])
+        return intake, burnRate
+        
+class MultiWeekPlan:
+    
+    # A program of distinct WeekPlans. The weeks before cycleStart (a ramp-up) run once, then
+    # weeks[cycleStart:] repeat for the rest of the horizon, so a cycle can be any number of weeks.
+    # Every day's intake and burn rate live in two flat arrays of 7 * len(weeks) entries; a week's
+    # entries are refilled only when its WeekPlan version (or an exercise rate) changed, and
+    # projections count how often each week occurs instead of walking the horizon week by week.
+    
+    def __init__(self, weeks = None, cycleStart = 0):
+        self.weeks = list(weeks) if weeks is not None else [WeekPlan()]
+        self.weekVersions = []
+        self.ratesVersion = None
+        self.intake = array('d')
+        self.burnRate = array('d')
+        self.weekIntake = array('d')
+        self.weekBurnRate = array('d')
+        self.setCycleStart(cycleStart)
+        
+    def addWeek(self, weekPlan = None):
+        if weekPlan is None:
+            weekPlan = WeekPlan()
+        self.weeks.append(weekPlan)
+        return weekPlan
+        
+    def getWeek(self, index):
+        return self.weeks[index]
+        
+    def getNumOfWeeks(self):
+        return len(self.weeks)
+        
+    def setCycleStart(self, cycleStart):
+        if not 0 <= cycleStart < len(self.weeks):
+            raise ValueError(f'cycleStart must be below the {len(self.weeks)} weeks in the plan')
+        self.cycleStart = cycleStart
+        
+    def getCycleStart(self):
+        return self.cycleStart
+        
+    def getPlanWeekIndex(self, horizonWeek):
+        # which of the plan's weeks runs in week horizonWeek (0-based) of a simulation
+        if horizonWeek < self.cycleStart:
+            return horizonWeek
+        return self.cycleStart + (horizonWeek - self.cycleStart) % (len(self.weeks) - self.cycleStart)
+        
+    def getWeekCounts(self, numOfWeeks):
+        # how many times each plan week runs in the first numOfWeeks weeks
+        counts = [0] * len(self.weeks)
+        rampWeeks = min(numOfWeeks, self.cycleStart)
+        for i in range(rampWeeks):
+            counts[i] = 1
+        numOfCycles, extraWeeks = divmod(numOfWeeks - rampWeeks, len(self.weeks) - self.cycleStart)
+        for i in range(self.cycleStart, len(self.weeks)):
+            counts[i] = numOfCycles + (1 if i - self.cycleStart < extraWeeks else 0)
+        return counts
+        
+    def refreshColumns(self):
+        numOfWeeks = len(self.weeks)
+        if len(self.weekVersions) != numOfWeeks or self.ratesVersion != exerciseRegistry.version:
+            self.weekVersions = [None] * numOfWeeks
+            self.intake = array('d', bytes(8 * 7 * numOfWeeks))
+            self.burnRate = array('d', bytes(8 * 7 * numOfWeeks))
+            self.weekIntake = array('d', bytes(8 * numOfWeeks))
+            self.weekBurnRate = array('d', bytes(8 * numOfWeeks))
+            self.ratesVersion = exerciseRegistry.version
+        for i, weekPlan in enumerate(self.weeks):
+            version = weekPlan.getVersion()
+            if version is self.weekVersions[i]:
+                continue
+            intake, burnRate = weekPlan.getDailyColumns()
+            self.intake[7 * i:7 * i + 7] = intake
+            self.burnRate[7 * i:7 * i + 7] = burnRate
+            self.weekIntake[i] = sum(intake)
+            self.weekBurnRate[i] = sum(burnRate)
+            self.weekVersions[i] = version
+            
+    def getDailyColumns(self):
+        # (intake, burnRate) for every day of every plan week, in order
+        self.refreshColumns()
+        return self.intake, self.burnRate
+        
+    def getWeeklyColumns(self):
+        self.refreshColumns()
+        return self.weekIntake, self.weekBurnRate
+        
+    def computeAverageWeeklyTotals(self, numOfWeeks, burnFactor):
+        # average weekly (intake, burn) over the first numOfWeeks weeks, burning at burnFactor
+        weekIntake, weekBurnRate = self.getWeeklyColumns()
+        counts = self.getWeekCounts(numOfWeeks)
+        totalIntake = sum(count * kCal for count, kCal in zip(counts, weekIntake))
+        totalBurnRate = sum(count * rate for count, rate in zip(counts, weekBurnRate))
+        return totalIntake / numOfWeeks, totalBurnRate * burnFactor / numOfWeeks
+        
+class PlanHistory:
+    
+    # Undo and redo over WeekPlan snapshots. versions[index] is the plan as it is now, undo and
+    # redo move the index and restore only the days that differ, and recording an edit after an
+    # undo drops the versions that were ahead of it.
+    
+    def __init__(self, weekPlan):
+        self.weekPlan = weekPlan
+        self.versions = [weekPlan.getVersion()]
+        self.index = 0
+        
+    def record(self):
+        # call after an edit; returns False when the plan did not actually change
+        version = self.weekPlan.getVersion()
+        if version == self.versions[self.index]:
+            return False
+        del self.versions[self.index + 1:]
+        self.versions.append(version)
+        self.index += 1
+        return True
+        
+    def canUndo(self):
+        return self.index > 0
+        
+    def canRedo(self):
+        return self.index < len(self.versions) - 1
+        
+    def undo(self):
+        if not self.canUndo():
+            return False
+        self.record()
+        self.index -= 1
+        self.weekPlan.restoreVersion(self.versions[self.index])
+        return True
+        
+    def redo(self):
+        if not self.canRedo():
+            return False
+        self.index += 1
+        self.weekPlan.restoreVersion(self.versions[self.index])
+        return True
+        
+    def getNumOfVersions(self):
+        return len(self.versions)
+        
+class SimulationConfig:
+    
+    def __init__(self, timeHorizon, weekPlan, avatar):
+        self.timeHorizon = timeHorizon
+        self.weekPlan = weekPlan
+        self.avatar = avatar
+        self.oldWeight = self.avatar.weight
+        self.oldbmi = self.avatar.bmi
+        
+    def getNumOfWeeks(self):
+        if self.timeHorizon == 3: numOfWeeks = 13
+        elif self.timeHorizon == 6: numOfWeeks = 26
+        elif self.timeHorizon == 12: numOfWeeks = 52
+        return numOfWeeks
+        
+    def getWeeklyTotals(self):
+        # a MultiWeekPlan gives its average week over the horizon, burning at the avatar's weight
+        if isinstance(self.weekPlan, MultiWeekPlan):
+            return self.weekPlan.computeAverageWeeklyTotals(self.getNumOfWeeks(), self.avatar.getBurnFactor())
+        return self.weekPlan.computeWeeklyTotals()
+        
+    def computeWeightChange(self):
+        totalIntake, totalBurn = self.getWeeklyTotals()
+        weeklyNet = totalIntake - totalBurn
+        totalNetkCal = self.getNumOfWeeks() * weeklyNet
+        weightChange = totalNetkCal / 20000
+        return weightChange
+        
+    def computeDailyIntakeTarget(self, goalWeight):
+        # computeWeightChange solved for the intake, keeping the week's exercise as it is
+        totalIntake, totalBurn = self.getWeeklyTotals()
+        weeklyNet = (goalWeight - self.oldWeight) * 20000 / self.getNumOfWeeks()
+        return (weeklyNet + totalBurn) / 7
+        
+    def getWeeklyNet(self, week):
+        # net kcal of week number week (0-based) of the horizon
+        if isinstance(self.weekPlan, MultiWeekPlan):
+            weekIntake, weekBurnRate = self.weekPlan.getWeeklyColumns()
+            planWeek = self.weekPlan.getPlanWeekIndex(week)
+            return weekIntake[planWeek] - weekBurnRate[planWeek] * self.avatar.getBurnFactor()
+        totalIntake, totalBurn = self.weekPlan.computeWeeklyTotals()
+        return totalIntake - totalBurn
+        
+    def iterWeeklyWeights(self):
+        # the weight at the end of every week of the horizon, one week per step
+        totalNetkCal = 0
+        for week in range(self.getNumOfWeeks()):
+            totalNetkCal += self.getWeeklyNet(week)
+            yield self.oldWeight + totalNetkCal / 20000
+        
+    def updateAvatarWeight(self):
+        self.avatar.weight += self.computeWeightChange()
+        
+    def getOldBmi(self):
+        return self.oldbmi
+        
+    def getOldWeight(self):
+        return self.oldWeight
+        
+class DynamicSimulationConfig(SimulationConfig):
+    
+    # timeHorizon is a number of days here. Exercise burn and BMR both depend on the current
+    # weight, so each day is an affine map weight -> a * weight + b. The daily maps of one cycle
+    # (the week, or the repeating weeks of a MultiWeekPlan) compose into one map which is raised
+    # to the number of full cycles in closed form, so a 10 year horizon costs the same as a 3
+    # month one.
+    
+    kCalPerLb = 3500
+        
+    def getDailyMaps(self, dailyIntake = None):
+        # dailyIntake replaces the planned meals with the same intake every day
+        bmrSlope = 10 / 2.205
+        bmrBase = self.avatar.computeBmr(0)
+        dailyMaps = []
+        for intake, burnRate in zip(*self.weekPlan.getDailyColumns()):
+            burnSlope = burnRate * 0.453 / 50
+            if dailyIntake is not None:
+                intake = dailyIntake
+            a = 1 - (burnSlope + bmrSlope) / self.kCalPerLb
+            b = (intake - bmrBase) / self.kCalPerLb
+            dailyMaps.append((a, b))
+        return dailyMaps
+        
+    def getRampDays(self):
+        # days before the plan starts repeating
+        if isinstance(self.weekPlan, MultiWeekPlan):
+            return 7 * self.weekPlan.getCycleStart()
+        return 0
+        
+    def computeNewWeight(self, dailyIntake = None):
+        dailyMaps = self.getDailyMaps(dailyIntake)
+        rampDays = self.getRampDays()
+        weight = self.oldWeight
+        for a, b in dailyMaps[:min(rampDays, self.timeHorizon)]:
+            weight = a * weight + b
+        cycleMaps = dailyMaps[rampDays:]
+        cycleA, cycleB = 1, 0
+        for a, b in cycleMaps:
+            cycleA, cycleB = a * cycleA, a * cycleB + b
+        numOfCycles, extraDays = divmod(max(0, self.timeHorizon - rampDays), len(cycleMaps))
+        if cycleA != 1:
+            powerA = cycleA ** numOfCycles
+            weight = powerA * weight + cycleB * (1 - powerA) / (1 - cycleA)
+        else:
+            weight = weight + numOfCycles * cycleB
+        for a, b in cycleMaps[:extraDays]:
+            weight = a * weight + b
+        return weight
+        
+    def computeWeightChange(self):
+        return self.computeNewWeight() - self.oldWeight
+        
+    def getNumOfWeeks(self):
+        # weeks the horizon touches, the last one may be partial
+        return -(-self.timeHorizon // 7)
+        
+    def iterWeeklyWeights(self):
+        # day by day instead of in closed form, yielding the weight at the end of every week
+        dailyMaps = self.getDailyMaps()
+        rampDays = self.getRampDays()
+        cycleDays = len(dailyMaps) - rampDays
+        weight = self.oldWeight
+        for day in range(self.timeHorizon):
+            a, b = dailyMaps[day if day < rampDays else rampDays + (day - rampDays) % cycleDays]
+            weight = a * weight + b
+            if day % 7 == 6 or day == self.timeHorizon - 1:
+                yield weight
+        
+    def computeDailyIntakeTarget(self, goalWeight):
+        # the final weight is affine in a constant daily intake, so two runs pin down the line
+        baseWeight = self.computeNewWeight(0)
+        slope = self.computeNewWeight(1) - baseWeight
+        return (goalWeight - baseWeight) / slope
+        
+class SimulationResult:
+    
+    def __init__(self, simulation, avatar):
+        self.simulation = simulation
+        self.avatar = avatar
+        self.simulation.updateAvatarWeight()
+        self.avatar.updateBmi()
+        
+    def getWeightChange(self):
+        return self.avatar.weight - self.simulation.getOldWeight()
+        
+    def getBmiChange(self):
+        return self.avatar.bmi - self.simulation.getOldBmi()
+        
+    def showChangeInString(self):
+        bmiChange = self.getBmiChange()
+        weightChange = self.getWeightChange()
+        if bmiChange == 0: bmiSign = 'same'
+        elif bmiChange > 0: bmiSign = 'increased'
+        else: bmiSign = 'decreased'
+        if weightChange == 0: weightSign = 'same'
+        elif weightChange > 0: weightSign = 'increased'
+        else: weightSign = 'decreased'
+        return (f'Your weight {weightSign} by {self.getWeightChange()},' +
+                f'and your BMI {bmiSign} by {self.getBmiChange()}'
+                )
+               
+    def showNewWeight(self):
+        return f'Your new weight is {self.avatar.weight}'
+        
+    def showNewBmi(self):
+        return f'Your new BMI is {self.avatar.bmi}'
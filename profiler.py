@@ -0,0 +1,162 @@
+'''
+PROFILER
+
+Opt-in timing for the screens in final.py. install(namespace) wraps every
+<screen>_redrawAll, _onMousePress, _onMouseMove and _onStep in the namespace, records a latency
+histogram and the number of draw calls per handler, and draws an overlay with the slowest
+handlers on top of each frame. Tab shows and hides the overlay.
+
+    python final.py --profile
+
+Nothing is wrapped unless install is called, so the app runs exactly as before without the flag.
+'''
+
+import re
+import time
+
+handlerPattern = re.compile(r'^(\w+)_(redrawAll|onMousePress|onMouseMove|onStep)$')
+drawFunctionNames = ['drawLabel', 'drawRect', 'drawImage', 'drawLine', 'drawCircle', 'drawOval',
+                     'drawPolygon', 'drawArc', 'drawStar', 'drawRegularPolygon']
+# upper edges of the histogram buckets in milliseconds
+bucketEdges = [0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 33, 50, 100, float('inf')]
+
+# Helper Functions
+
+def withArity(numOfArgs, function):
+    # cmu_graphics only passes optional arguments (the mouse button, the key modifiers) to
+    # handlers with a parameter for them, so a wrapper takes exactly as many as its handler
+    if numOfArgs == 1:
+        return lambda app: function(app)
+    elif numOfArgs == 2:
+        return lambda app, arg: function(app, arg)
+    elif numOfArgs == 3:
+        return lambda app, arg1, arg2: function(app, arg1, arg2)
+    return lambda app, arg1, arg2, arg3: function(app, arg1, arg2, arg3)
+
+# Classes
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = [0] * len(bucketEdges)
+        self.numOfCalls = 0
+        self.totalMs = 0
+        self.maxMs = 0
+        self.drawCalls = 0
+
+    def record(self, ms, drawCalls):
+        bucket = 0
+        while ms > bucketEdges[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.numOfCalls += 1
+        self.totalMs += ms
+        self.maxMs = max(self.maxMs, ms)
+        self.drawCalls += drawCalls
+
+    def getMeanMs(self):
+        return self.totalMs / self.numOfCalls if self.numOfCalls > 0 else 0
+
+    def getPercentileMs(self, percentile):
+        # upper edge of the bucket holding the percentile, capped at the slowest call
+        needed = percentile / 100 * self.numOfCalls
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count > 0 and seen >= needed:
+                return min(bucketEdges[bucket], self.maxMs)
+        return 0
+
+    def getDrawCallsPerCall(self):
+        return self.drawCalls / self.numOfCalls if self.numOfCalls > 0 else 0
+
+class Profiler:
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.histograms = dict()
+        self.drawCalls = 0
+        self.isOverlayVisible = True
+        self.overlayDraw = dict()
+
+    def install(self):
+        for name in drawFunctionNames:
+            if name in self.namespace:
+                self.overlayDraw[name] = self.namespace[name]
+                self.namespace[name] = self.countDrawCalls(self.namespace[name])
+        screens = []
+        for name in sorted(self.namespace):
+            match = handlerPattern.match(name)
+            if match is None or not callable(self.namespace[name]):
+                continue
+            screen, handler = match.groups()
+            self.namespace[name] = self.wrapHandler(name, self.namespace[name])
+            if handler == 'redrawAll':
+                screens.append(screen)
+        for screen in screens:
+            self.namespace[f'{screen}_redrawAll'] = self.addOverlay(self.namespace[f'{screen}_redrawAll'])
+            keyPressName = f'{screen}_onKeyPress'
+            self.namespace[keyPressName] = self.addOverlayToggle(self.namespace.get(keyPressName))
+
+    def countDrawCalls(self, drawFunction):
+        def wrapper(*args, **kwargs):
+            self.drawCalls += 1
+            return drawFunction(*args, **kwargs)
+        return wrapper
+
+    def wrapHandler(self, name, handler):
+        histogram = self.histograms.setdefault(name, LatencyHistogram())
+        def wrapper(*args):
+            drawCallsBefore = self.drawCalls
+            start = time.perf_counter()
+            result = handler(*args)
+            histogram.record((time.perf_counter() - start) * 1000, self.drawCalls - drawCallsBefore)
+            return result
+        return withArity(handler.__code__.co_argcount, wrapper)
+
+    def addOverlay(self, redrawAll):
+        def wrapper(app):
+            redrawAll(app)
+            if self.isOverlayVisible:
+                self.drawOverlay()
+        return wrapper
+
+    def addOverlayToggle(self, onKeyPress):
+        def wrapper(app, key, *modifiers):
+            if key == 'tab':
+                self.isOverlayVisible = not self.isOverlayVisible
+            elif onKeyPress is not None:
+                onKeyPress(app, key, *modifiers)
+        return withArity(2 if onKeyPress is None else onKeyPress.__code__.co_argcount, wrapper)
+
+    def getRows(self, limit = None):
+        rows = [(name, histogram) for name, histogram in self.histograms.items() if histogram.numOfCalls > 0]
+        rows.sort(key = lambda row: row[1].totalMs, reverse = True)
+        return rows[:limit]
+
+    def formatRow(self, name, histogram):
+        return (f'{name[:30]:30} {histogram.numOfCalls:6} {histogram.getMeanMs():6.2f} '
+                f'{histogram.getPercentileMs(95):6.2f} {histogram.maxMs:6.2f} {histogram.getDrawCallsPerCall():5.0f}')
+
+    def getHeader(self):
+        return f"{'handler':30} {'calls':>6} {'mean':>6} {'p95':>6} {'max':>6} {'draws':>5}"
+
+    def drawOverlay(self, limit = 12):
+        # uses the unwrapped draw functions so the overlay is not counted
+        drawRect = self.overlayDraw['drawRect']
+        drawLabel = self.overlayDraw['drawLabel']
+        rows = self.getRows(limit)
+        lines = [self.getHeader() + '  (ms, tab hides)'] + [self.formatRow(name, histogram) for name, histogram in rows]
+        drawRect(590, 5, 605, 16 * len(lines) + 10, fill = 'black', opacity = 75)
+        for i, line in enumerate(lines):
+            drawLabel(line, 600, 18 + 16 * i, size = 11, font = 'monospace', fill = 'white', align = 'left')
+
+    def printSummary(self):
+        print(self.getHeader())
+        for name, histogram in self.getRows():
+            print(self.formatRow(name, histogram))
+
+def install(namespace):
+    profiler = Profiler(namespace)
+    profiler.install()
+    return profiler
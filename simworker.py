@@ -0,0 +1,112 @@
+'''
+SIMULATION WORKER
+
+Runs a simulation on a background thread so the screens keep redrawing while it works. The
+worker simulates a copy of the avatar against a copy of the week plan (rebuilt from the plan's
+version, so later edits cannot reach it), reports how far it got, and can be cancelled. The
+result is moved onto the real avatar by applyResult, which the UI calls from onStep once the
+worker is done. When NumPy is installed the worker also samples the plan with imperfect adherence
+(cohort.simulateMonteCarlo) and keeps the percentile bands for the result screen.
+
+    worker = SimulationWorker(SimulationConfig, 12, app.weekPlan, avatar)
+    worker.start()
+    ...
+    progress, message = worker.getProgress()
+    if worker.isDone(): app.simResult = worker.applyResult()
+'''
+
+import copy
+import threading
+
+from model import WeekPlan, SimulationResult
+
+class SimulationCancelled(Exception):
+    pass
+
+class SimulationWorker:
+
+    def __init__(self, configClass, timeHorizon, weekPlan, avatar):
+        self.configClass = configClass
+        self.timeHorizon = timeHorizon
+        self.planVersion = weekPlan.getVersion()
+        self.avatar = avatar
+        self.avatarCopy = copy.copy(avatar)
+        self.progress = 0
+        self.message = 'Starting...'
+        self.trajectory = []
+        self.bands = None
+        self.result = None
+        self.error = None
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.thread = threading.Thread(target = self.run, daemon = True)
+
+    def start(self):
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def isCancelled(self):
+        return self.cancelled.is_set()
+
+    def isDone(self):
+        return self.done.is_set()
+
+    def getProgress(self):
+        # (fraction done, what the worker is doing)
+        return self.progress, self.message
+
+    def getTrajectory(self):
+        # weight at the end of every simulated week
+        return self.trajectory
+        
+    def getBands(self):
+        # MonteCarloResult, or None without NumPy
+        return self.bands
+
+    def setProgress(self, progress, message):
+        if self.cancelled.is_set():
+            raise SimulationCancelled()
+        self.progress = progress
+        self.message = message
+
+    def run(self):
+        try:
+            self.setProgress(0, 'Taking in data...')
+            weekPlan = WeekPlan()
+            weekPlan.restoreVersion(self.planVersion)
+            config = self.configClass(self.timeHorizon, weekPlan, self.avatarCopy)
+            numOfWeeks = config.getNumOfWeeks()
+            for week, weight in enumerate(config.iterWeeklyWeights()):
+                self.trajectory.append(weight)
+                self.setProgress(0.05 + 0.75 * (week + 1) / numOfWeeks, 'Calculating results...')
+            self.setProgress(0.8, 'Sampling adherence...')
+            self.bands = self.sampleBands(config)
+            self.setProgress(0.95, 'Finalizing...')
+            result = SimulationResult(config, self.avatarCopy)
+            self.setProgress(1, 'Completed!')
+            self.result = result
+        except SimulationCancelled:
+            self.message = 'Cancelled'
+        except Exception as error:
+            self.error = error
+            self.message = f'Simulation failed: {error}'
+        finally:
+            self.done.set()
+
+    def sampleBands(self, config):
+        try:
+            from cohort import simulateMonteCarlo
+        except ImportError:
+            return None
+        return simulateMonteCarlo(config)
+        
+    def applyResult(self):
+        # called on the UI thread; None when the worker was cancelled or failed
+        if self.result is None:
+            return None
+        self.avatar.weight = self.avatarCopy.weight
+        self.avatar.bmi = self.avatarCopy.bmi
+        self.result.avatar = self.avatar
+        return self.result
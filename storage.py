@@ -0,0 +1,166 @@
+'''
+STORAGE
+
+Keeps avatars and their week plans in SQLite so they survive a restart. Only the avatars table
+(one short row per avatar) is read at startup; a week plan is read when its avatar is selected.
+
+Saves are queued and written together in one transaction by flush, so clicking through the
+metric buttons does not hit the disk on every press. Plates are stored as an array of
+(food, servings) int pairs, with the food ids mapped to rows of the foods table because catalog
+ids are only stable within one run.
+'''
+
+import sqlite3
+from array import array
+
+from model import Avatar, FoodItem, Plate, ExerciseSession, WeekPlan, foodCatalog, packItems, unpackItems
+
+schema = '''
+CREATE TABLE IF NOT EXISTS avatars (
+    avatarId INTEGER PRIMARY KEY, name TEXT NOT NULL, age INTEGER, sex TEXT,
+    height REAL, weight REAL, imageNum INTEGER);
+CREATE INDEX IF NOT EXISTS avatarsByName ON avatars (name);
+CREATE TABLE IF NOT EXISTS foods (
+    storedId INTEGER PRIMARY KEY, name TEXT NOT NULL, kcal REAL NOT NULL,
+    category TEXT NOT NULL DEFAULT '', UNIQUE (name, category, kcal));
+CREATE TABLE IF NOT EXISTS plates (
+    avatarId INTEGER, day TEXT, mealType TEXT, items BLOB,
+    PRIMARY KEY (avatarId, day, mealType)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS exercises (
+    avatarId INTEGER, day TEXT, position INTEGER, typeOf TEXT, duration INTEGER,
+    PRIMARY KEY (avatarId, day, position)) WITHOUT ROWID;
+'''
+
+def parseNumber(value):
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+# Classes
+
+class AvatarStore:
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(schema)
+        self.avatarIds = dict()
+        self.storedIds = dict()
+        self.foodIds = dict()
+        self.pendingAvatars = dict()
+        self.pendingPlans = dict()
+        row = self.connection.execute('SELECT MAX(avatarId) FROM avatars').fetchone()
+        self.nextAvatarId = (row[0] or 0) + 1
+
+    def getAvatarId(self, avatar):
+        # avatars made this run get an id when first saved
+        key = id(avatar)
+        if key not in self.avatarIds:
+            self.avatarIds[key] = (self.nextAvatarId, avatar)
+            self.nextAvatarId += 1
+        return self.avatarIds[key][0]
+
+    # Loading
+
+    def loadAvatarIndex(self):
+        # returns [(avatar, imageNum)] in the order the avatars were created
+        avatars = []
+        rows = self.connection.execute(
+            'SELECT avatarId, name, age, sex, height, weight, imageNum FROM avatars ORDER BY avatarId')
+        for avatarId, name, age, sex, height, weight, imageNum in rows:
+            avatar = Avatar(name, age, sex, parseNumber(height), parseNumber(weight))
+            avatar.updateBmi()
+            self.avatarIds[id(avatar)] = (avatarId, avatar)
+            avatars.append((avatar, imageNum))
+        return avatars
+
+    def getFoodId(self, storedId):
+        if storedId not in self.foodIds:
+            name, kcal, category = self.connection.execute(
+                'SELECT name, kcal, category FROM foods WHERE storedId = ?', (storedId,)).fetchone()
+            # '' is an uncategorized food, since UNIQUE treats every NULL as distinct
+            foodItem = foodCatalog.intern(FoodItem(name, parseNumber(kcal), category or None))
+            self.foodIds[storedId] = foodItem.foodId
+            self.storedIds[foodItem.foodId] = storedId
+        return self.foodIds[storedId]
+
+    def loadWeekPlan(self, avatar):
+        # None when nothing was saved for this avatar
+        avatarId = self.getAvatarId(avatar)
+        plateRows = self.connection.execute(
+            'SELECT day, mealType, items FROM plates WHERE avatarId = ?', (avatarId,)).fetchall()
+        exerciseRows = self.connection.execute(
+            'SELECT day, typeOf, duration FROM exercises WHERE avatarId = ? ORDER BY day, position',
+            (avatarId,)).fetchall()
+        if plateRows == [] and exerciseRows == []:
+            return None
+        weekPlan = WeekPlan()
+        # equal rows (a meal set for the whole week) share one packed plate
+        plates = dict()
+        for day, mealType, data in plateRows:
+            if data not in plates:
+                items = array('i')
+                items.frombytes(data)
+                plates[data] = Plate(packItems((self.getFoodId(items[i]), items[i + 1])
+                                               for i in range(0, len(items), 2)))
+            weekPlan.setMealPlate(day, plates[data], mealType)
+        for day, typeOf, duration in exerciseRows:
+            weekPlan.addExercise(day, ExerciseSession(typeOf, duration, avatar))
+        return weekPlan
+
+    # Saving
+
+    def saveAvatar(self, avatar, imageNum):
+        self.pendingAvatars[self.getAvatarId(avatar)] = (avatar, imageNum)
+
+    def saveWeekPlan(self, avatar, weekPlan):
+        self.pendingPlans[self.getAvatarId(avatar)] = (avatar, weekPlan)
+
+    def getStoredId(self, foodId):
+        if foodId not in self.storedIds:
+            foodItem = foodCatalog.getFoodItem(foodId)
+            key = (foodItem.foodName, foodItem.kcalPerServ, foodItem.category or '')
+            self.connection.execute('INSERT OR IGNORE INTO foods (name, kcal, category) VALUES (?, ?, ?)', key)
+            storedId = self.connection.execute(
+                'SELECT storedId FROM foods WHERE name = ? AND kcal = ? AND category = ?', key).fetchone()[0]
+            self.storedIds[foodId] = storedId
+            self.foodIds[storedId] = foodId
+        return self.storedIds[foodId]
+
+    def getPlanRows(self, avatarId, weekPlan):
+        plateRows, exerciseRows = [], []
+        for day in weekPlan.week:
+            for mealType in ['breakfast', 'lunch', 'dinner']:
+                plate = weekPlan.getMealPlate(day, mealType)
+                if plate is None:
+                    continue
+                items = array('i')
+                for foodId, servings in unpackItems(plate.toBytes()):
+                    items.extend((self.getStoredId(foodId), servings))
+                plateRows.append((avatarId, day, mealType, items.tobytes()))
+            for position, session in enumerate(weekPlan.getExercises(day)):
+                exerciseRows.append((avatarId, day, position, session.typeOf, session.duration))
+        return plateRows, exerciseRows
+
+    def flush(self):
+        # everything queued since the last flush is written in one transaction
+        if self.pendingAvatars == dict() and self.pendingPlans == dict():
+            return
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO avatars (avatarId, name, age, sex, height, weight, imageNum) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(avatarId, avatar.name, avatar.age, avatar.sex, avatar.height, avatar.weight, imageNum)
+                 for avatarId, (avatar, imageNum) in self.pendingAvatars.items()])
+            planIds = [(avatarId,) for avatarId in self.pendingPlans]
+            self.connection.executemany('DELETE FROM plates WHERE avatarId = ?', planIds)
+            self.connection.executemany('DELETE FROM exercises WHERE avatarId = ?', planIds)
+            for avatarId, (avatar, weekPlan) in self.pendingPlans.items():
+                plateRows, exerciseRows = self.getPlanRows(avatarId, weekPlan)
+                self.connection.executemany('INSERT INTO plates VALUES (?, ?, ?, ?)', plateRows)
+                self.connection.executemany('INSERT INTO exercises VALUES (?, ?, ?, ?, ?)', exerciseRows)
+        self.pendingAvatars = dict()
+        self.pendingPlans = dict()
+
+    def close(self):
+        self.flush()
+        self.connection.close()